@@ -1,18 +1,18 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import time
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from dotenv import load_dotenv
 import models
-from database import get_db
-import logging
-
-# Set passlib log level to ERROR to ignore warnings
-logging.getLogger("passlib").setLevel(logging.ERROR)
+from database import get_async_db
+from metrics import metrics, timed
+import password_hashing
 
 load_dotenv()
 
@@ -20,34 +20,113 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Seconds a verified user stays cached before it is re-read from the database
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+# Put the user ID and admin flag in issued tokens so requests can skip the database
+AUTH_TOKEN_CLAIMS = os.getenv("AUTH_TOKEN_CLAIMS", "false").lower() == "true"
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Same scheme for endpoints that also serve anonymous (guest) callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+class Principal:
+    """
+    The authenticated user as seen by request handlers.
+
+    Attributes:
+        id (int): User ID.
+        username (str): Username.
+        email (Optional[str]): Email address (None when built from token claims).
+        is_admin (bool): Flag for administrative privileges.
+    """
+
+    def __init__(self, id: int, username: str, email: Optional[str], is_admin: bool):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.is_admin = is_admin
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.username, user.email, bool(user.is_admin))
+
+# username -> (principal, expiry time)
+_principal_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+def invalidate_user(username: Optional[str] = None):
+    """
+    Drop a cached user so the next request re-reads it from the database.
 
-def verify_password(plain_password, hashed_password):
+    Args:
+        username (Optional[str]): The user to drop; all users if None.
+    """
+    if username is None:
+        _principal_cache.clear()
+    else:
+        _principal_cache.pop(username, None)
+
+def token_claims(user: models.User) -> dict:
+    """
+    Build the claims for a user's access token.
+
+    Args:
+        user (models.User): The authenticated user.
+
+    Returns:
+        dict: 'sub' plus, if AUTH_TOKEN_CLAIMS is enabled, 'uid' and 'adm'.
+    """
+    claims = {"sub": user.username}
+    if AUTH_TOKEN_CLAIMS:
+        claims.update({"uid": user.id, "adm": bool(user.is_admin)})
+    return claims
+
+async def verify_password(plain_password, hashed_password):
     """
     Verify a plain password against its hashed version.
 
+    The bcrypt work runs in a dedicated process pool so that login bursts
+    do not tie up the threads serving other requests.
+
     Args:
         plain_password (str): The plaintext password provided by the user.
         hashed_password (str): The hashed password stored in the database.
 
+    Raises:
+        HTTPException: 503 if the hashing queue is full.
+
     Returns:
         bool: True if passwords match, False otherwise.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return await password_hashing.verify_password(plain_password, hashed_password)
+    except password_hashing.PasswordHashingBusy:
+        raise _busy_exception()
 
-def get_password_hash(password):
+async def get_password_hash(password):
     """
     Hash a plaintext password.
 
     Args:
         password (str): The plaintext password to hash.
 
+    Raises:
+        HTTPException: 503 if the hashing queue is full.
+
     Returns:
         str: The hashed password.
     """
-    return pwd_context.hash(password)
+    try:
+        return await password_hashing.hash_password(password)
+    except password_hashing.PasswordHashingBusy:
+        raise _busy_exception()
+
+def _busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication is busy, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """
@@ -69,33 +148,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decode_token(token: str, credentials_exception: HTTPException) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+async def _load_principal(username: str, db: AsyncSession, credentials_exception: HTTPException) -> Principal:
+    cached = _principal_cache.get(username)
+    if cached is not None and cached[1] > time.monotonic():
+        metrics.incr("auth.cache_hit")
+        return cached[0]
+
+    metrics.incr("auth.cache_miss")
+    with timed("auth_db"):
+        result = await db.execute(select(models.User).where(models.User.username == username))
+        user = result.scalars().first()
+    if user is None:
+        # The user was deleted or renamed; drop its expired entry
+        invalidate_user(username)
+        raise credentials_exception
+
+    principal = Principal.from_user(user)
+    _principal_cache[username] = (principal, time.monotonic() + AUTH_CACHE_TTL)
+    _principal_cache.move_to_end(username)
+    if len(_principal_cache) > AUTH_CACHE_SIZE:
+        _principal_cache.popitem(last=False)
+    return principal
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """
     Retrieve the current authenticated user from the JWT token.
 
+    Tokens carrying 'uid' and 'adm' claims are trusted without a database
+    lookup; otherwise the user is served from a short-lived cache and only
+    read from the database on a miss.
+
     Args:
         token (str): The JWT access token extracted from the request.
-        db (Session): SQLAlchemy database session.
+        db (AsyncSession): SQLAlchemy asyncio database session.
 
     Raises:
         HTTPException: If token is invalid or user is not found.
 
     Returns:
-        models.User: The user object retrieved from the database.
+        Principal: The authenticated user.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    credentials_exception = _credentials_exception()
+    with timed("auth"):
+        payload = _decode_token(token, credentials_exception)
+        if "uid" in payload and "adm" in payload:
+            metrics.incr("auth.token_claims")
+            return Principal(payload["uid"], payload["sub"], None, bool(payload["adm"]))
+        return await _load_principal(payload["sub"], db, credentials_exception)
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve the current user if the request carries a token.
+
+    Args:
+        token (Optional[str]): The JWT access token, if any.
+        db (AsyncSession): SQLAlchemy asyncio database session.
+
+    Raises:
+        HTTPException: If a token is given but invalid.
+
+    Returns:
+        Optional[Principal]: The authenticated user, or None for guests.
+    """
+    if token is None:
+        return None
+    return await get_current_user(token, db)
+
+async def get_current_user_profile(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve the full profile of the current user, ignoring token claims.
+
+    Args:
+        token (str): The JWT access token extracted from the request.
+        db (AsyncSession): SQLAlchemy asyncio database session.
+
+    Raises:
+        HTTPException: If token is invalid or user is not found.
+
+    Returns:
+        Principal: The authenticated user including the email address.
+    """
+    credentials_exception = _credentials_exception()
+    with timed("auth"):
+        payload = _decode_token(token, credentials_exception)
+        return await _load_principal(payload["sub"], db, credentials_exception)
@@ -1,10 +1,11 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import auth
-from database import get_db
+from database import get_async_db
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -36,22 +37,23 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user if the username or email does not already exist.
 
     Args:
         user (UserCreate): The user information from the request body.
-        db (Session): SQLAlchemy database session.
+        db (AsyncSession): SQLAlchemy asyncio database session.
 
     Returns:
         UserResponse: The created user details.
     """
     # Check if username or email already exists
-    db_user = db.query(models.User).filter(
+    result = await db.execute(select(models.User).where(
         (models.User.username == user.username) | 
         (models.User.email == user.email)
-    ).first()
+    ))
+    db_user = result.scalars().first()
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -59,53 +61,57 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return a JWT access token upon successful login.
 
     Args:
         form_data (OAuth2PasswordRequestForm): The form data containing username and password.
-        db (Session): SQLAlchemy database session.
+        db (AsyncSession): SQLAlchemy asyncio database session.
 
     Returns:
         Token: The JWT access token and token type.
     """
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    result = await db.execute(select(models.User).where(models.User.username == form_data.username))
+    user = result.scalars().first()
+    if not user or not await auth.verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+
+    # Signing in again picks up changes to the user row (e.g. a new admin flag) right away
+    auth.invalidate_user(user.username)
+
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=auth.token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserResponse)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+def read_users_me(current_user: auth.Principal = Depends(auth.get_current_user_profile)):
     """
     Retrieve the currently authenticated user's information.
 
     Args:
-        current_user (models.User): The user retrieved from the access token.
+        current_user (auth.Principal): The user retrieved from the access token.
 
     Returns:
         UserResponse: The current user's details.
@@ -0,0 +1,131 @@
+"""Benchmark concurrent streaming throughput of the chat endpoints.
+
+Two modes are supported:
+
+    # In-process comparison of blocking vs. native async provider iteration
+    python benchmarks/concurrent_streams.py simulate --streams 20 --tokens 50
+
+    # Against a running backend (run once before and once after a change)
+    python benchmarks/concurrent_streams.py http --url http://localhost:8000 \
+        --model llama3.2 --streams 10
+
+The simulate mode mimics a provider that takes ``--token-delay`` seconds to
+produce each token. The blocking variant iterates a synchronous generator
+inside an async generator (the old ``llm.stream()`` loop), the async variant
+awaits between tokens (``llm.astream()``). Both report aggregate tokens/sec
+and the worst latency seen by a probe coroutine standing in for other
+requests such as ``/models``.
+"""
+import argparse
+import asyncio
+import time
+
+def blocking_provider(tokens: int, delay: float):
+    """Synchronous token source, like ``Ollama(...).stream()``."""
+    for i in range(tokens):
+        time.sleep(delay)
+        yield f"t{i} "
+
+async def async_provider(tokens: int, delay: float):
+    """Asynchronous token source, like ``Ollama(...).astream()``."""
+    for i in range(tokens):
+        await asyncio.sleep(delay)
+        yield f"t{i} "
+
+async def blocking_stream(tokens: int, delay: float):
+    for chunk in blocking_provider(tokens, delay):
+        yield chunk
+
+async def async_stream(tokens: int, delay: float):
+    async for chunk in async_provider(tokens, delay):
+        yield chunk
+
+async def consume(stream) -> int:
+    count = 0
+    async for _ in stream:
+        count += 1
+        # Give other tasks a chance to run, as the ASGI server does between sends
+        await asyncio.sleep(0)
+    return count
+
+async def probe(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Measure the worst scheduling delay seen by an unrelated coroutine."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+async def run_simulation(factory, streams: int, tokens: int, delay: float):
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop))
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(consume(factory(tokens, delay)) for _ in range(streams)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst_probe = await probe_task
+    return sum(counts), elapsed, worst_probe
+
+def simulate(args):
+    for label, factory in (("blocking (before)", blocking_stream), ("async (after)", async_stream)):
+        total, elapsed, worst_probe = asyncio.run(
+            run_simulation(factory, args.streams, args.tokens, args.token_delay)
+        )
+        print(
+            f"{label:18} streams={args.streams} tokens={total} "
+            f"elapsed={elapsed:.2f}s throughput={total / elapsed:.1f} tok/s "
+            f"worst_probe_delay={worst_probe * 1000:.0f}ms"
+        )
+
+async def run_http(args):
+    import httpx
+
+    async def one_stream(client: httpx.AsyncClient, index: int):
+        start = time.perf_counter()
+        first_chunk = None
+        received = 0
+        body = {"user_input": f"{args.prompt} ({index})", "history": [], "model": args.model, "category": 1}
+        async with client.stream("POST", f"{args.url}/guest/chat", json=body) as response:
+            async for chunk in response.aiter_text():
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - start
+                received += len(chunk)
+        return received, first_chunk or 0.0
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one_stream(client, i) for i in range(args.streams)))
+        elapsed = time.perf_counter() - start
+
+    chars = sum(received for received, _ in results)
+    ttfts = sorted(ttft for _, ttft in results)
+    print(
+        f"streams={args.streams} chars={chars} elapsed={elapsed:.2f}s "
+        f"throughput={chars / elapsed:.1f} chars/s "
+        f"ttft_p50={ttfts[len(ttfts) // 2] * 1000:.0f}ms ttft_max={ttfts[-1] * 1000:.0f}ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    sim = sub.add_parser("simulate", help="In-process blocking vs async comparison")
+    sim.add_argument("--streams", type=int, default=20)
+    sim.add_argument("--tokens", type=int, default=50)
+    sim.add_argument("--token-delay", type=float, default=0.02)
+
+    http = sub.add_parser("http", help="Concurrent /guest/chat streams against a running server")
+    http.add_argument("--url", default="http://localhost:8000")
+    http.add_argument("--model", default="llama3.2")
+    http.add_argument("--prompt", default="Give me three tips for planning a study week")
+    http.add_argument("--streams", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.mode == "simulate":
+        simulate(args)
+    else:
+        asyncio.run(run_http(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure recall and latency of the semantic cache index.
+
+    python benchmarks/semantic_cache.py --entries 10000 --dim 768 --queries 500
+    python benchmarks/semantic_cache.py --entries 10000 --memmap /tmp/semantic.f16
+
+Fills a ``semantic_cache.VectorIndex`` (float16, optionally memory-mapped)
+with random unit vectors and queries it with noisy copies of stored
+vectors, like paraphrased questions. Each query is also answered by an
+exact float32 brute-force search over the same vectors; recall@1 is the
+share of queries where both return the same row. Reports per-query
+latency of both searches and the vector memory each needs, which helps
+pick ``SEMANTIC_CACHE_MAX_ENTRIES``.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+def percentile_ms(samples: list, q: float) -> float:
+    return float(np.percentile(samples, q)) * 1000
+
+def run(args):
+    from semantic_cache import VectorIndex
+
+    rng = np.random.default_rng(args.seed)
+    vectors = unit_rows(rng.standard_normal((args.entries, args.dim)).astype(np.float32))
+    targets = rng.integers(0, args.entries, size=args.queries)
+    queries = unit_rows(vectors[targets] + args.noise * rng.standard_normal((args.queries, args.dim)).astype(np.float32))
+
+    index = VectorIndex(args.entries, args.memmap)
+    start = time.perf_counter()
+    for vector in vectors:
+        index.insert("bench", vector)
+    insert_seconds = time.perf_counter() - start
+
+    index_latencies, baseline_latencies = [], []
+    matches = 0
+    for query in queries:
+        start = time.perf_counter()
+        row, _ = index.search("bench", query)
+        index_latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        expected = int(np.argmax(vectors @ query))
+        baseline_latencies.append(time.perf_counter() - start)
+
+        matches += row == expected
+
+    print(
+        f"entries={args.entries} dim={args.dim} queries={args.queries} noise={args.noise} "
+        f"memmap={'yes' if args.memmap else 'no'}"
+    )
+    print(f"insert: {insert_seconds / args.entries * 1e6:.1f}us/vector")
+    print(
+        f"float16 index: recall@1={matches / args.queries:.4f} "
+        f"p50={percentile_ms(index_latencies, 50):.2f}ms p99={percentile_ms(index_latencies, 99):.2f}ms "
+        f"vectors={args.entries * args.dim * 2 / 2**20:.1f}MiB"
+    )
+    print(
+        f"float32 brute force: p50={percentile_ms(baseline_latencies, 50):.2f}ms "
+        f"p99={percentile_ms(baseline_latencies, 99):.2f}ms "
+        f"vectors={vectors.nbytes / 2**20:.1f}MiB"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=0.05, help="Per-dimension noise added to each query")
+    parser.add_argument("--memmap", default="", help="File to memory-map the index to")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args)
+
+if __name__ == "__main__":
+    main()
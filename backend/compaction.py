@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+from typing import List, Optional, Set, Tuple
+
+import database
+import llm_clients
+import message_writer
+import models
+from conversation_history import count_tokens, history_cache
+from model_residency import residency
+from scheduler import QueueFull, QueueTimeout, scheduler
+
+logger = logging.getLogger(__name__)
+
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+# Compact once the summary plus uncompacted messages exceed this many tokens
+COMPACTION_THRESHOLD_TOKENS = int(os.getenv("COMPACTION_THRESHOLD_TOKENS", "3000"))
+# Number of most recent messages that are always kept verbatim
+COMPACTION_KEEP_RECENT = int(os.getenv("COMPACTION_KEEP_RECENT", "6"))
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a study session between a learner and an assistant. "
+    "Update the summary with the new messages below. Keep the learner's goals, questions, "
+    "decisions, open problems and any facts the assistant relied on. Write in the third person, "
+    "in under 250 words, and output only the summary."
+)
+
+_pending: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+def build_summary_prompt(previous_summary: Optional[str], messages: List[Tuple[int, str, str]]) -> str:
+    """Build the prompt asking the model to fold older messages into the summary.
+
+    Args:
+        previous_summary: The currently stored summary, if any
+        messages: (id, role, content) tuples to fold in, in chronological order
+
+    Returns:
+        str: The summarization prompt
+    """
+    parts = [SUMMARY_INSTRUCTIONS, "\n\nCurrent summary:\n", previous_summary or "(none)", "\n\nNew messages:\n"]
+    for _, role, content in messages:
+        speaker = "Learner" if role == "user" else "Assistant"
+        parts.append(f"{speaker}: {content}\n")
+    parts.append("\nUpdated summary:")
+    return "".join(parts)
+
+async def summarize(prompt: str, model_name: str, model_type: str) -> str:
+    """Run a non-streaming completion with the conversation's model.
+
+    Args:
+        prompt: The summarization prompt
+        model_name: Name of the model
+        model_type: Either 'ollama' or 'groq'
+
+    Returns:
+        str: The generated summary
+    """
+    llm = llm_clients.registry.get(model_type, model_name)
+    if model_type == "ollama":
+        response = await llm.generate(model=model_name, prompt=prompt, keep_alive=residency.keep_alive_for(model_name))
+        return response["response"].strip()
+    response = await llm.ainvoke([{"role": "user", "content": prompt}])
+    return response.content.strip()
+
+def _load_uncompacted(conversation_id: int) -> Tuple[Optional[str], List[Tuple[int, str, str]]]:
+    db = database.SessionLocal()
+    try:
+        summary = db.query(models.ConversationSummary).filter(
+            models.ConversationSummary.conversation_id == conversation_id
+        ).first()
+        query = db.query(models.Message.id, models.Message.role, models.Message.content).filter(
+            models.Message.conversation_id == conversation_id
+        )
+        if summary is not None:
+            query = query.filter(models.Message.id > summary.last_message_id)
+        rows = query.order_by(models.Message.id).all()
+        return (summary.content if summary else None), [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+def _store_summary(conversation_id: int, content: str, last_message_id: int):
+    db = database.SessionLocal()
+    try:
+        summary = db.query(models.ConversationSummary).filter(
+            models.ConversationSummary.conversation_id == conversation_id
+        ).first()
+        if summary is None:
+            summary = models.ConversationSummary(conversation_id=conversation_id)
+            db.add(summary)
+        summary.content = content
+        summary.last_message_id = last_message_id
+        summary.token_count = count_tokens(content)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def compact_conversation(conversation_id: int, model_name: str, model_type: str) -> bool:
+    """Fold the older part of a conversation into its stored summary.
+
+    Nothing happens while the summary plus the uncompacted messages stay
+    under ``COMPACTION_THRESHOLD_TOKENS``. The newest
+    ``COMPACTION_KEEP_RECENT`` messages are never summarized.
+
+    Args:
+        conversation_id: The conversation ID
+        model_name: Name of the model used to write the summary
+        model_type: Either 'ollama' or 'groq'
+
+    Returns:
+        bool: True if a new summary was stored
+    """
+    # Messages still queued by the write-behind writer belong in the transcript being summarized
+    await message_writer.writer.flush_conversation(conversation_id)
+    previous_summary, messages = await asyncio.to_thread(_load_uncompacted, conversation_id)
+    total = count_tokens(previous_summary) if previous_summary else 0
+    total += sum(count_tokens(content) for _, _, content in messages)
+    if total < COMPACTION_THRESHOLD_TOKENS:
+        return False
+
+    older = messages[:-COMPACTION_KEEP_RECENT] if COMPACTION_KEEP_RECENT else messages
+    if not older:
+        return False
+
+    # Summaries share the model's generation slots with chat answers
+    try:
+        admission = await scheduler.acquire(model_type, model_name, "compaction")
+    except (QueueFull, QueueTimeout):
+        logger.info(f"Model {model_name} is busy, compaction of conversation {conversation_id} deferred")
+        return False
+    try:
+        summary = await summarize(build_summary_prompt(previous_summary, older), model_name, model_type)
+    finally:
+        admission.release()
+    if not summary:
+        return False
+
+    await asyncio.to_thread(_store_summary, conversation_id, summary, older[-1][0])
+    # The cached turns still contain the summarized messages
+    history_cache.invalidate(conversation_id)
+    logger.info(f"Compacted {len(older)} messages of conversation {conversation_id}")
+    return True
+
+async def _run(conversation_id: int, model_name: str, model_type: str):
+    try:
+        await compact_conversation(conversation_id, model_name, model_type)
+    except Exception as e:
+        logger.error(f"Compaction of conversation {conversation_id} failed: {str(e)}")
+    finally:
+        _pending.discard(conversation_id)
+
+def schedule(conversation_id: int, model_name: str, model_type: str):
+    """Compact a conversation in the background if it may be over the threshold.
+
+    Called after the assistant message is saved; the live stream never waits
+    for it. At most one compaction per conversation runs at a time.
+
+    Args:
+        conversation_id: The conversation ID
+        model_name: Name of the model used to write the summary
+        model_type: Either 'ollama' or 'groq'
+    """
+    if not COMPACTION_ENABLED or conversation_id in _pending:
+        return
+    cached_tokens = history_cache.cached_tokens(conversation_id)
+    if cached_tokens is not None and cached_tokens < COMPACTION_THRESHOLD_TOKENS:
+        return
+    _pending.add(conversation_id)
+    task = asyncio.get_running_loop().create_task(_run(conversation_id, model_name, model_type))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Optional, Tuple
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Categories (prompt slugs) whose answers are cached, e.g. "text-summarization,general"; empty disables the cache
+COMPLETION_CACHE_CATEGORIES = os.getenv("COMPLETION_CACHE_CATEGORIES", "")
+# How long (seconds) a cached answer is served
+COMPLETION_CACHE_TTL_SECONDS = float(os.getenv("COMPLETION_CACHE_TTL_SECONDS", "86400"))
+# Answers kept in memory, least recently used evicted first
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "1000"))
+# SQLite file of the persistent tier; empty keeps the cache in memory only
+COMPLETION_CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "completion_cache.sqlite3")
+)
+# Answers kept on disk, least recently used evicted first
+COMPLETION_CACHE_MAX_DISK_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_DISK_ENTRIES", "50000"))
+# Size of the chunks a cached answer is streamed in
+COMPLETION_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("COMPLETION_CACHE_REPLAY_CHUNK_CHARS", "64"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip()
+
+def make_key(model_type: str, model_name: str, system_prompt: str, history: list, prompt: str, sampling: Optional[dict] = None) -> str:
+    """Build the cache key of a request.
+
+    Whitespace is collapsed in the prompt and history so trivially different
+    inputs share an entry; everything else must match exactly.
+
+    Args:
+        model_type: Either 'ollama' or 'groq'
+        model_name: Name of the model
+        system_prompt: The system prompt (including any conversation summary)
+        history: Previous turns with 'role' and 'content'
+        prompt: The current user input
+        sampling: Sampling options sent to the model, or None for its defaults
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    payload = json.dumps([
+        model_type,
+        model_name,
+        system_prompt,
+        [[turn.role, _normalize(turn.content)] for turn in history],
+        _normalize(prompt),
+        sampling or {},
+    ], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def replay(text: str) -> AsyncIterator[str]:
+    """Stream a cached answer in chunks, like a model would.
+
+    Args:
+        text: The cached answer
+
+    Yields:
+        str: Pieces of the answer
+    """
+    for start in range(0, len(text), COMPLETION_CACHE_REPLAY_CHUNK_CHARS):
+        yield text[start:start + COMPLETION_CACHE_REPLAY_CHUNK_CHARS]
+        # Let other streams run between chunks
+        await asyncio.sleep(0)
+
+class _DiskTier:
+    """SQLite table of cached answers shared across restarts.
+
+    Calls are blocking and meant to run in a worker thread; a lock
+    serializes them on the single connection.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def open(self, ttl: float):
+        with self._lock:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_completions_last_used ON completions (last_used)")
+            self._conn.execute("DELETE FROM completions WHERE created_at < ?", (time.time() - ttl,))
+            self._conn.commit()
+            self.entries = self._conn.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get(self, key: str, ttl: float) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute("SELECT text, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            expired = row[1] < now - ttl
+            if expired:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                self.entries -= 1
+            else:
+                self._conn.execute("UPDATE completions SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return None if expired else row
+
+    def put(self, key: str, text: str, created_at: float):
+        with self._lock:
+            if self._conn is None:
+                return
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO completions (key, text, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, text, created_at, created_at)
+            )
+            self.entries += cursor.rowcount
+            excess = self.entries - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM completions WHERE key IN "
+                    "(SELECT key FROM completions ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.entries -= excess
+            self._conn.commit()
+
+class CompletionCache:
+    """Exact-match cache of complete model answers.
+
+    Answers are keyed on the model, system prompt, history, prompt and
+    sampling options (see ``make_key``). Lookups check a bounded in-memory
+    LRU first and then an optional SQLite tier that survives restarts; disk
+    hits are promoted into memory. Entries expire ``ttl`` seconds after the
+    answer was generated. Only categories listed in
+    ``COMPLETION_CACHE_CATEGORIES`` are cached, since most categories are
+    conversational and rarely repeat exactly.
+    """
+
+    def __init__(self, categories: str, ttl: float, max_entries: int, path: str, max_disk_entries: int):
+        self.categories = {slug.strip() for slug in categories.split(",") if slug.strip()}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._disk = _DiskTier(path, max_disk_entries) if path else None
+        self._disk_open = False
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def enabled_for(self, category_slug: str) -> bool:
+        """Check whether answers of a category are cached."""
+        return category_slug in self.categories
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached answer.
+
+        Args:
+            key: Key from ``make_key``
+
+        Returns:
+            Optional[str]: The answer, or None if missing or expired
+        """
+        start = time.perf_counter()
+        entry = self._memory.get(key)
+        if entry is not None:
+            if entry[1] >= time.time() - self.ttl:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                metrics.incr("completion_cache.hits.memory")
+                return entry[0]
+            del self._memory[key]
+
+        if self._disk_open:
+            try:
+                entry = await asyncio.to_thread(self._disk.get, key, self.ttl)
+            except Exception as e:
+                logger.error(f"Completion cache read failed: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._remember(key, entry[0], entry[1])
+                self.hits_disk += 1
+                metrics.incr("completion_cache.hits.disk")
+                metrics.observe("completion_cache.disk_read", time.perf_counter() - start)
+                return entry[0]
+
+        self.misses += 1
+        metrics.incr("completion_cache.misses")
+        return None
+
+    async def put(self, key: str, text: str):
+        """Store a complete answer.
+
+        Args:
+            key: Key from ``make_key``
+            text: The full answer text
+        """
+        if not text:
+            return
+        created_at = time.time()
+        self._remember(key, text, created_at)
+        metrics.incr("completion_cache.stores")
+        if self._disk_open:
+            try:
+                await asyncio.to_thread(self._disk.put, key, text, created_at)
+            except Exception as e:
+                logger.error(f"Completion cache write failed: {str(e)}")
+
+    def _remember(self, key: str, text: str, created_at: float):
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Get entry counts, hits, misses and the hit rate."""
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        return {
+            "categories": sorted(self.categories),
+            "memory_entries": len(self._memory),
+            "disk_entries": self._disk.entries if self._disk_open else 0,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    async def start(self):
+        """Open the disk tier and drop expired entries, if any category is cached."""
+        if not self.categories or self._disk is None or self._disk_open:
+            return
+        try:
+            await asyncio.to_thread(self._disk.open, self.ttl)
+            self._disk_open = True
+        except Exception as e:
+            logger.error(f"Could not open completion cache at {self._disk.path}, using memory only: {str(e)}")
+
+    async def stop(self):
+        """Close the disk tier."""
+        if self._disk_open:
+            self._disk_open = False
+            await asyncio.to_thread(self._disk.close)
+
+completion_cache = CompletionCache(
+    COMPLETION_CACHE_CATEGORIES,
+    COMPLETION_CACHE_TTL_SECONDS,
+    COMPLETION_CACHE_MAX_ENTRIES,
+    COMPLETION_CACHE_PATH,
+    COMPLETION_CACHE_MAX_DISK_ENTRIES
+)
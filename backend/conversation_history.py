@@ -0,0 +1,203 @@
+import logging
+import os
+from collections import OrderedDict, deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import message_writer
+import models
+
+logger = logging.getLogger(__name__)
+
+# Number of conversations whose recent turns are kept in memory
+HISTORY_CACHE_CONVERSATIONS = int(os.getenv("HISTORY_CACHE_CONVERSATIONS", "512"))
+# Maximum number of turns loaded and cached per conversation
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "50"))
+# Context window used for models without an explicit entry
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("DEFAULT_CONTEXT_TOKENS", "4096"))
+# Tokens kept free for the model's answer
+RESPONSE_TOKEN_RESERVE = int(os.getenv("RESPONSE_TOKEN_RESERVE", "1024"))
+
+# Context windows of the default models, overridable with
+# MODEL_CONTEXT_TOKENS="llama3.2=8192,phi4=16384"
+MODEL_CONTEXT_TOKENS = {
+    "llama3.2": 8192,
+    "phi4": 16384,
+    "gemma3": 8192,
+    "deepseek-r1": 8192,
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "gemma-7b-it": 8192,
+}
+for _entry in filter(None, os.getenv("MODEL_CONTEXT_TOKENS", "").split(",")):
+    _name, _, _tokens = _entry.partition("=")
+    MODEL_CONTEXT_TOKENS[_name.strip()] = int(_tokens)
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception as e:  # tiktoken missing or its encoding could not be loaded
+    logger.warning(f"tiktoken unavailable, falling back to approximate token counts: {str(e)}")
+    _encoding = None
+
+def count_tokens(text: str) -> int:
+    """Count the tokens in a piece of text.
+
+    Uses the cl100k BPE tokenizer, which tracks the Llama/Gemma family
+    closely enough for budgeting. Falls back to ~4 characters per token.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        int: Number of tokens
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+class Turn(NamedTuple):
+    """A single conversation turn with its token count.
+
+    Attributes:
+        role: 'user' or 'assistant'.
+        content: The message text.
+        tokens: Token count of the formatted turn.
+    """
+    role: str
+    content: str
+    tokens: int
+
+def make_turn(role: str, content: str) -> Turn:
+    # Account for the "Human: " / "Assistant: " prefix and newline
+    return Turn(role, content, count_tokens(content) + 4)
+
+def context_budget(model_name: str) -> int:
+    """Get the number of prompt tokens available for a model.
+
+    Args:
+        model_name: Name of the model
+
+    Returns:
+        int: Context window minus the reserve for the response
+    """
+    return MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_CONTEXT_TOKENS) - RESPONSE_TOKEN_RESERVE
+
+def trim_to_budget(turns: List[Turn], budget: int) -> List[Turn]:
+    """Keep the most recent turns that fit into the token budget.
+
+    Args:
+        turns: Turns in chronological order
+        budget: Number of tokens available for history
+
+    Returns:
+        List[Turn]: The newest turns whose total fits the budget, in order
+    """
+    kept = 0
+    used = 0
+    for turn in reversed(turns):
+        if used + turn.tokens > budget:
+            break
+        used += turn.tokens
+        kept += 1
+    return turns[len(turns) - kept:]
+
+class _CachedHistory:
+    """Summary and recent turns of one conversation."""
+
+    def __init__(self, summary: Optional[str], turns: Deque[Turn]):
+        self.summary = summary
+        self.turns = turns
+
+    @property
+    def tokens(self) -> int:
+        summary_tokens = count_tokens(self.summary) if self.summary else 0
+        return summary_tokens + sum(turn.tokens for turn in self.turns)
+
+class HistoryCache:
+    """LRU cache of the most recent turns of active conversations.
+
+    A conversation is loaded from the ``messages`` table on first use; later
+    turns are appended in memory as they are saved, so steady chatting does
+    not re-read the transcript. Messages already folded into the
+    conversation's stored summary are not loaded.
+    """
+
+    def __init__(self, max_conversations: int = 512, max_turns: int = 50):
+        self.max_conversations = max_conversations
+        self.max_turns = max_turns
+        self._entries: "OrderedDict[int, _CachedHistory]" = OrderedDict()
+
+    async def load(self, db: AsyncSession, conversation_id: int) -> Tuple[Optional[str], List[Turn]]:
+        """Get the summary and recent turns of a conversation.
+
+        Args:
+            db: SQLAlchemy asyncio database session
+            conversation_id: The conversation ID
+
+        Returns:
+            Tuple[Optional[str], List[Turn]]: The stored summary (if any) and up
+            to ``max_turns`` later turns in chronological order
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            # Messages of this conversation still in the write-behind queue must be read back too
+            await message_writer.writer.flush_conversation(conversation_id)
+            summary = (await db.execute(
+                select(models.ConversationSummary).where(
+                    models.ConversationSummary.conversation_id == conversation_id
+                )
+            )).scalars().first()
+            query = select(models.Message.role, models.Message.content).where(
+                models.Message.conversation_id == conversation_id
+            )
+            if summary is not None:
+                query = query.where(models.Message.id > summary.last_message_id)
+            rows = (await db.execute(
+                query.order_by(
+                    models.Message.created_at.desc(), models.Message.id.desc()
+                ).limit(self.max_turns)
+            )).all()
+            turns = deque((make_turn(role, content) for role, content in reversed(rows)), maxlen=self.max_turns)
+            entry = _CachedHistory(summary.content if summary else None, turns)
+            self._entries[conversation_id] = entry
+            if len(self._entries) > self.max_conversations:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(conversation_id)
+        return entry.summary, list(entry.turns)
+
+    def cached_tokens(self, conversation_id: int) -> Optional[int]:
+        """Get the token count of a cached conversation without touching the database.
+
+        Args:
+            conversation_id: The conversation ID
+
+        Returns:
+            Optional[int]: Tokens of the summary plus cached turns, or None if the
+            conversation is not cached or has more turns than the cache holds
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None or len(entry.turns) == entry.turns.maxlen:
+            return None
+        return entry.tokens
+
+    def append(self, conversation_id: int, role: str, content: str):
+        """Record a newly saved message for a cached conversation.
+
+        Args:
+            conversation_id: The conversation ID
+            role: 'user' or 'assistant'
+            content: The message text
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is not None:
+            entry.turns.append(make_turn(role, content))
+
+    def invalidate(self, conversation_id: int):
+        """Forget the cached turns of a conversation."""
+        self._entries.pop(conversation_id, None)
+
+history_cache = HistoryCache(HISTORY_CACHE_CONVERSATIONS, HISTORY_MAX_TURNS)
@@ -0,0 +1,409 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from conversation_history import count_tokens
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# How often (seconds) a streaming request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+# How long (seconds) generation continues with no client attached, waiting for a resume
+STREAM_DETACH_GRACE_SECONDS = float(os.getenv("STREAM_DETACH_GRACE_SECONDS", "15"))
+# How long (seconds) a finished stream can still be replayed
+STREAM_REPLAY_GRACE_SECONDS = float(os.getenv("STREAM_REPLAY_GRACE_SECONDS", "60"))
+# Most recent bytes of an answer kept for replay
+STREAM_BUFFER_MAX_BYTES = int(os.getenv("STREAM_BUFFER_MAX_BYTES", str(1024 * 1024)))
+# Longest time (seconds) a new question waits for the answer it replaces to store its partial text
+SUPERSEDE_WAIT_SECONDS = float(os.getenv("SUPERSEDE_WAIT_SECONDS", "5"))
+# Expected answer length (tokens) for models without completed answers yet
+DEFAULT_COMPLETION_TOKENS = int(os.getenv("DEFAULT_COMPLETION_TOKENS", "400"))
+
+CLIENT_DISCONNECT = "client_disconnect"
+USER_CANCEL = "user_cancel"
+SUPERSEDED = "superseded"
+SHUTDOWN = "shutdown"
+FAILED = "failed"
+
+class StreamExpired(Exception):
+    """Raised when a resume offset is no longer held in the replay buffer."""
+
+class ReplayBuffer:
+    """Bounded byte log of one streamed answer.
+
+    Offsets count bytes from the start of the answer. Only the newest
+    ``max_bytes`` are kept; older data is dropped and can no longer be
+    replayed.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data = bytearray()
+        self._start = 0
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    @property
+    def end(self) -> int:
+        """Offset just past the last byte written."""
+        return self._start + len(self._data)
+
+    def append(self, data: bytes):
+        self._data += data
+        overflow = len(self._data) - self.max_bytes
+        if overflow > 0:
+            del self._data[:overflow]
+            self._start += overflow
+        self._notify()
+
+    def close(self):
+        self.closed = True
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def read(self, offset: int) -> bytes:
+        """Get everything written from ``offset`` on.
+
+        Raises:
+            StreamExpired: If ``offset`` was already dropped
+        """
+        if offset < self._start:
+            raise StreamExpired()
+        return bytes(self._data[offset - self._start:])
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for new data or the end of the stream.
+
+        Returns:
+            bool: False if the timeout passed first
+        """
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+class Generation:
+    """One answer being generated, its replay buffer and the means to stop it.
+
+    Generation runs in a producer task that writes into ``buffer``; HTTP
+    responses are subscribers reading the buffer from an offset, so a client
+    that lost its connection can resume with the stream ID. When no client
+    has been attached for ``STREAM_DETACH_GRACE_SECONDS`` the generation is
+    cancelled.
+
+    Attributes:
+        stream_id: Unguessable ID used to resume the stream.
+        conversation_id: The conversation the answer belongs to, or None for guests.
+        user_id: ID of the user who asked, or None for guests.
+        model_name: Model generating the answer.
+        buffer: Replay buffer of the answer.
+        cancelled: Set once the generation should stop.
+        reason: Why it was cancelled, if it was.
+    """
+
+    def __init__(self, conversation_id: Optional[int], user_id: Optional[int], model_name: str):
+        self.stream_id = uuid.uuid4().hex
+        self.conversation_id = conversation_id
+        self.user_id = user_id
+        self.model_name = model_name
+        self.buffer = ReplayBuffer(STREAM_BUFFER_MAX_BYTES)
+        self.cancelled = asyncio.Event()
+        self.reason: Optional[str] = None
+        self.started_at = time.perf_counter()
+        self.coalesce_key: Optional[str] = None
+        self._subscribers = 0
+        self._detach_timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def cancel(self, reason: str):
+        """Ask the generation to stop; the first reason given is kept."""
+        if not self.cancelled.is_set():
+            self.reason = reason
+            self.cancelled.set()
+
+    def allows(self, principal) -> bool:
+        """Check whether a caller may read this stream (guest streams are open to the holder of the ID)."""
+        if self.user_id is None:
+            return True
+        return principal is not None and (principal.is_admin or principal.id == self.user_id)
+
+    async def subscribe(self, offset: int = 0, request=None) -> AsyncIterator[bytes]:
+        """Stream the answer from ``offset`` until it ends or the client leaves.
+
+        Args:
+            offset: Byte offset to start from
+            request: The Starlette request, polled for client disconnects
+
+        Yields:
+            bytes: Answer data
+
+        Raises:
+            StreamExpired: If ``offset`` is no longer buffered
+        """
+        self._attach()
+        try:
+            while True:
+                data = self.buffer.read(offset)
+                if data:
+                    offset += len(data)
+                    yield data
+                    continue
+                if self.buffer.closed:
+                    return
+                if not await self.buffer.wait(DISCONNECT_POLL_SECONDS):
+                    if request is not None and await request.is_disconnected():
+                        return
+        finally:
+            self._detach()
+
+    def _attach(self):
+        self._subscribers += 1
+        if self._detach_timer is not None:
+            self._detach_timer.cancel()
+            self._detach_timer = None
+
+    def _detach(self):
+        self._subscribers -= 1
+        if self._subscribers == 0 and not self.buffer.closed:
+            # Keep generating for a while in case the client comes back
+            self._detach_timer = asyncio.get_running_loop().call_later(
+                STREAM_DETACH_GRACE_SECONDS, self._abandoned
+            )
+
+    def _abandoned(self):
+        self._detach_timer = None
+        if self._subscribers == 0:
+            self.cancel(CLIENT_DISCONNECT)
+
+class GenerationRegistry:
+    """Running generations by conversation and by stream ID, and typical answer lengths by model.
+
+    A conversation has at most one running generation: starting a new one
+    cancels the previous answer. Finished streams stay replayable for
+    ``STREAM_REPLAY_GRACE_SECONDS``. The average length of completed answers
+    per model is used to estimate how many tokens a cancellation saved.
+    """
+
+    def __init__(self):
+        self._active: Dict[int, Generation] = {}
+        self._streams: Dict[str, Generation] = {}
+        self._completions: Dict[str, list] = {}
+        self._coalescing: Dict[str, Generation] = {}
+
+    def start(self, conversation_id: Optional[int], user_id: Optional[int], model_name: str, coalesce_key: Optional[str] = None) -> Generation:
+        """Register a new generation, cancelling the conversation's previous one.
+
+        Args:
+            conversation_id: The conversation ID, or None for guests (not cancellable by ID)
+            user_id: ID of the user, or None for guests
+            model_name: Model generating the answer
+            coalesce_key: Lets identical requests join this generation while it runs (see ``join``)
+
+        Returns:
+            Generation: The new generation
+        """
+        generation = Generation(conversation_id, user_id, model_name)
+        if coalesce_key is not None:
+            generation.coalesce_key = coalesce_key
+            self._coalescing[coalesce_key] = generation
+        if conversation_id is not None:
+            previous = self._active.get(conversation_id)
+            if previous is not None:
+                previous.cancel(SUPERSEDED)
+            self._active[conversation_id] = generation
+        self._streams[generation.stream_id] = generation
+        metrics.gauge("generation.active", 1)
+        return generation
+
+    def launch(self, generation: Generation, source: AsyncIterator[str], on_finish: Optional[Callable[[], None]] = None):
+        """Run ``source`` in a producer task writing into the generation's buffer.
+
+        Args:
+            generation: The generation returned by ``start``
+            source: The answer's chunk stream
+            on_finish: Called once the producer ends, e.g. to release a scheduler slot
+        """
+        generation._task = asyncio.get_running_loop().create_task(self._produce(generation, source, on_finish))
+
+    async def _produce(self, generation: Generation, source: AsyncIterator[str], on_finish: Optional[Callable[[], None]]):
+        try:
+            async for chunk in source:
+                generation.buffer.append(chunk.encode("utf-8"))
+        except Exception as e:
+            logger.error(f"Stream {generation.stream_id} failed: {str(e)}")
+        finally:
+            if on_finish is not None:
+                on_finish()
+            if generation.coalesce_key is not None and self._coalescing.get(generation.coalesce_key) is generation:
+                del self._coalescing[generation.coalesce_key]
+            generation.buffer.close()
+            asyncio.get_running_loop().call_later(
+                STREAM_REPLAY_GRACE_SECONDS, self._streams.pop, generation.stream_id, None
+            )
+
+    def get(self, conversation_id: int) -> Optional[Generation]:
+        """Get the running generation of a conversation, if any."""
+        return self._active.get(conversation_id)
+
+    def join(self, coalesce_key: str) -> Optional[Generation]:
+        """Find a running generation for an identical request.
+
+        Args:
+            coalesce_key: Key from ``coalesce_key``
+
+        Returns:
+            Optional[Generation]: The generation, if it is still running and
+            its replay buffer still holds the answer from the start
+        """
+        generation = self._coalescing.get(coalesce_key)
+        if generation is None or generation.cancelled.is_set() or generation.buffer.closed:
+            return None
+        try:
+            generation.buffer.read(0)
+        except StreamExpired:
+            return None
+        return generation
+
+    def get_stream(self, stream_id: str) -> Optional[Generation]:
+        """Get a running or recently finished generation by stream ID."""
+        return self._streams.get(stream_id)
+
+    def cancel(self, conversation_id: int, reason: str = USER_CANCEL) -> bool:
+        """Cancel the running generation of a conversation.
+
+        Returns:
+            bool: True if a running generation was cancelled
+        """
+        generation = self._active.get(conversation_id)
+        if generation is None or generation.cancelled.is_set():
+            return False
+        generation.cancel(reason)
+        return True
+
+    async def supersede(self, generation: Generation, timeout: float = SUPERSEDE_WAIT_SECONDS):
+        """Cancel a generation replaced by a new question and wait for its producer to end.
+
+        The producer stores the partial answer as it ends, so waiting keeps
+        that answer ahead of the new question in the stored transcript and
+        the history cache.
+
+        Args:
+            generation: The conversation's running generation
+            timeout: Longest time to wait for the producer
+        """
+        generation.cancel(SUPERSEDED)
+        if generation._task is not None and not generation._task.done():
+            await asyncio.wait([generation._task], timeout=timeout)
+
+    def finish(self, generation: Generation, text: str):
+        """Unregister a generation from its conversation and record its outcome.
+
+        Args:
+            generation: The generation that ended
+            text: The answer produced, complete or partial
+        """
+        if generation.conversation_id is not None and self._active.get(generation.conversation_id) is generation:
+            del self._active[generation.conversation_id]
+        metrics.gauge("generation.active", -1)
+
+        tokens = count_tokens(text) if text else 0
+        if generation.reason == FAILED:
+            metrics.incr("generation.failed")
+        elif generation.cancelled.is_set():
+            saved = max(self.expected_tokens(generation.model_name) - tokens, 0)
+            metrics.incr(f"generation.cancelled.{generation.reason}")
+            metrics.incr("generation.tokens_saved_estimate", saved)
+            logger.info(f"Generation for conversation {generation.conversation_id} cancelled ({generation.reason}) "
+                        f"after {tokens} tokens, ~{saved} tokens saved")
+        else:
+            completed = self._completions.setdefault(generation.model_name, [0, 0])
+            completed[0] += 1
+            completed[1] += tokens
+            metrics.incr("generation.completed")
+            metrics.incr("generation.tokens", tokens)
+
+    def expected_tokens(self, model_name: str) -> int:
+        """Average length (tokens) of the model's completed answers."""
+        count, total = self._completions.get(model_name, (0, 0))
+        return total // count if count else DEFAULT_COMPLETION_TOKENS
+
+    async def shutdown(self, timeout: float = 5.0):
+        """Cancel running generations and wait for them to store their partial answers."""
+        tasks: List[asyncio.Task] = []
+        for generation in self._streams.values():
+            generation.cancel(SHUTDOWN)
+            if generation._task is not None and not generation._task.done():
+                tasks.append(generation._task)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+def coalesce_key(model_type: str, model_name: str, system_prompt: str, history: list, prompt: str) -> str:
+    """Hash everything that determines an answer, so identical requests share one generation.
+
+    Args:
+        model_type: Either 'ollama' or 'groq'
+        model_name: Name of the model
+        system_prompt: The system prompt
+        history: Previous turns with 'role' and 'content'
+        prompt: The current user input
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    digest = hashlib.sha256()
+    for part in (model_type, model_name, system_prompt, *(f"{turn.role}:{turn.content}" for turn in history), prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+registry = GenerationRegistry()
+
+async def until_cancelled(source: AsyncIterator[str], generation: Generation) -> AsyncIterator[str]:
+    """Relay chunks from ``source`` until it ends or the generation is cancelled.
+
+    On cancellation the pending read is cancelled and the source closed, which
+    closes the upstream HTTP stream so the model server stops generating.
+
+    Args:
+        source: The model's chunk stream
+        generation: The generation to watch
+
+    Yields:
+        str: Response text chunks
+    """
+    iterator = source.__aiter__()
+    cancel_wait = asyncio.ensure_future(generation.cancelled.wait())
+    next_chunk: Optional[asyncio.Future] = None
+    try:
+        while True:
+            next_chunk = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({next_chunk, cancel_wait}, return_when=asyncio.FIRST_COMPLETED)
+            if next_chunk not in done:
+                return
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        cancel_wait.cancel()
+        if next_chunk is not None and not next_chunk.done():
+            # Abandon the read in progress; unwinding the source closes its HTTP stream
+            next_chunk.cancel()
+            try:
+                await next_chunk
+            except BaseException:
+                pass
+        try:
+            await iterator.aclose()
+        except Exception:
+            pass
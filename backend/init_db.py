@@ -5,6 +5,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 from passlib.context import CryptContext
 from models import Base, User, Category, ModelList, Conversation
+import migrations
 import logging
 import requests
 
@@ -75,7 +76,7 @@ def init_db():
     Initialize the database by dropping all existing tables, recreating them,
     and populating default data including an admin user, AI models, and categories.
 
-    - Drops and recreates all tables.
+    - Drops and recreates all tables, recording every schema migration as applied.
     - Adds a default admin user if not present.
     - Queries available Ollama models and sets their availability.
     - Adds a predefined set of default models to the ModelList table.
@@ -84,7 +85,9 @@ def init_db():
     try:
         logger.info("Recreating database tables...")
         Base.metadata.drop_all(bind=engine)
-        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+        migrations.migrate(engine)
         
         db = SessionLocal()
         
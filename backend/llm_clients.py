@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+import ollama
+from langchain_groq import ChatGroq
+
+logger = logging.getLogger(__name__)
+
+def _settings() -> dict:
+    """Read the client settings from the environment.
+
+    Settings are read on every lookup so that changing them (e.g. rotating the
+    Groq API key) rebuilds the affected clients on their next use.
+
+    Returns:
+        dict: Current connection settings
+    """
+    return {
+        "ollama_host": os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+        "groq_api_key": os.getenv("GROQ_API_KEY", ""),
+        "max_connections": int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20")),
+        "max_keepalive": int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10")),
+        "keepalive_expiry": float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120")),
+        "timeout": float(os.getenv("LLM_REQUEST_TIMEOUT", "600")),
+    }
+
+def _limits(settings: dict) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings["max_connections"],
+        max_keepalive_connections=settings["max_keepalive"],
+        keepalive_expiry=settings["keepalive_expiry"],
+    )
+
+class _ClientEntry:
+    """A cached client together with the settings it was built from.
+
+    Attributes:
+        client: The provider client handed out to callers.
+        transport: The underlying httpx client owning the connection pool.
+        fingerprint: Settings the client was built with.
+        last_used: Monotonic time of the last lookup.
+    """
+
+    def __init__(self, client, transport: Optional[httpx.AsyncClient], fingerprint: tuple):
+        self.client = client
+        self.transport = transport
+        self.fingerprint = fingerprint
+        self.last_used = time.monotonic()
+
+class LLMClientRegistry:
+    """Process-wide registry of warm LLM clients keyed by (model_type, model_name).
+
+    Each client keeps its own keep-alive connection pool, so steady traffic
+    reuses open connections instead of paying connection and TLS setup on
+    every request. Clients are rebuilt when their settings change and are
+    evicted after being idle for ``idle_ttl`` seconds.
+    """
+
+    def __init__(self, idle_ttl: float = 600.0):
+        self.idle_ttl = idle_ttl
+        self._entries: Dict[Tuple[str, str], _ClientEntry] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        # Replaced pools waiting to be closed; holding the tasks keeps them from being garbage collected
+        self._closing: Dict[asyncio.Task, httpx.AsyncClient] = {}
+
+    def get(self, model_type: str, model_name: str):
+        """Return a warm client for the model, building it if needed.
+
+        Args:
+            model_type: Either 'ollama' or 'groq'
+            model_name: Name of the model
+
+        Returns:
+            ollama.AsyncClient or ChatGroq: The client for the model
+
+        Raises:
+            ValueError: If the model type is unsupported or not configured
+        """
+        settings = _settings()
+        key = (model_type, model_name)
+        fingerprint = self._fingerprint(model_type, settings)
+        entry = self._entries.get(key)
+
+        if entry is not None and entry.fingerprint != fingerprint:
+            logger.info("Settings changed, rebuilding %s client for %s", model_type, model_name)
+            self._discard(key)
+            entry = None
+
+        if entry is None:
+            entry = self._build(model_type, model_name, settings, fingerprint)
+            self._entries[key] = entry
+
+        entry.last_used = time.monotonic()
+        return entry.client
+
+    def _fingerprint(self, model_type: str, settings: dict) -> tuple:
+        pool = (settings["max_connections"], settings["max_keepalive"], settings["keepalive_expiry"], settings["timeout"])
+        if model_type == "ollama":
+            return (settings["ollama_host"],) + pool
+        if model_type == "groq":
+            return (settings["groq_api_key"],) + pool
+        raise ValueError(f"Unsupported model type: {model_type}")
+
+    def _build(self, model_type: str, model_name: str, settings: dict, fingerprint: tuple) -> _ClientEntry:
+        if model_type == "ollama":
+            client = ollama.AsyncClient(
+                host=settings["ollama_host"],
+                timeout=settings["timeout"],
+                limits=_limits(settings),
+            )
+            # The Ollama client owns its httpx pool
+            return _ClientEntry(client, getattr(client, "_client", None), fingerprint)
+
+        if not settings["groq_api_key"]:
+            raise ValueError("Groq API key is not configured")
+        transport = httpx.AsyncClient(timeout=settings["timeout"], limits=_limits(settings))
+        client = ChatGroq(
+            api_key=settings["groq_api_key"],
+            model_name=model_name,
+            streaming=True,
+            http_async_client=transport,
+        )
+        return _ClientEntry(client, transport, fingerprint)
+
+    def _discard(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.transport is not None:
+            try:
+                task = asyncio.get_running_loop().create_task(self._close_later(entry.transport))
+            except RuntimeError:
+                return
+            self._closing[task] = entry.transport
+            task.add_done_callback(lambda done: self._closing.pop(done, None))
+
+    @staticmethod
+    async def _close_later(transport: httpx.AsyncClient):
+        # Streams that already hold the old client may still be reading from
+        # its pool, so wait out the request timeout before closing it
+        await asyncio.sleep(_settings()["timeout"])
+        await transport.aclose()
+
+    def evict_idle(self) -> int:
+        """Drop clients that have not been used for ``idle_ttl`` seconds.
+
+        Returns:
+            int: Number of evicted clients
+        """
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [key for key, entry in self._entries.items() if entry.last_used < cutoff]
+        for key in idle:
+            self._discard(key)
+        if idle:
+            logger.info("Evicted %d idle LLM clients", len(idle))
+        return len(idle)
+
+    async def _sweep(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def start(self, interval: float = 60.0):
+        """Start the background idle-eviction task."""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep(interval))
+
+    async def close(self):
+        """Stop the eviction task and close every pooled connection, including replaced ones."""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            if entry.transport is not None:
+                await entry.transport.aclose()
+        # Close replaced pools now instead of waiting out their delay
+        closing = list(self._closing.items())
+        self._closing.clear()
+        for task, transport in closing:
+            task.cancel()
+            await transport.aclose()
+
+registry = LLMClientRegistry(idle_ttl=float(os.getenv("LLM_CLIENT_IDLE_TTL", "600")))
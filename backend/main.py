@@ -1,20 +1,37 @@
+import asyncio
+import base64
 import os
-from typing import List, Optional
-from fastapi import FastAPI, Depends, HTTPException, status
+from datetime import datetime
+from typing import Any, List, NamedTuple, Optional, Tuple
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from langchain.llms import Ollama
-from langchain_groq import ChatGroq
+from sqlalchemy import and_, delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from pydantic import BaseModel
 from starlette.responses import StreamingResponse
-import ollama
 import models
 import database
 import auth
+import password_hashing
+import llm_clients
+import model_catalog
+import compaction
+import migrations
+import message_writer
+import generations
+from scheduler import QueueFull, QueueTimeout, scheduler
+import ollama_context
+from model_residency import residency
+from prompt_cache import prompt_cache
+from completion_cache import completion_cache, make_key, replay
+from semantic_cache import semantic_cache
+from response_checkpoint import COMPLETE, INTERRUPTED, ResponseCheckpointer, drain_detached
+from metrics import ServerTimingMiddleware, metrics
+from conversation_history import Turn, history_cache, make_turn, trim_to_budget, context_budget, count_tokens
 from auth_routes import router as auth_router
 from dotenv import load_dotenv
-import requests
 
 # Load environment variables
 load_dotenv()
@@ -22,8 +39,11 @@ load_dotenv()
 # Get Groq API key
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 
-# Create database tables
-models.Base.metadata.create_all(bind=database.engine)
+# Characters of the last message shown in the conversation listing
+CONVERSATION_PREVIEW_CHARS = int(os.getenv("CONVERSATION_PREVIEW_CHARS", "120"))
+
+# Create missing tables and apply pending schema migrations
+migrations.migrate(database.engine)
 
 app = FastAPI()
 
@@ -34,65 +54,42 @@ app.add_middleware(
     allow_credentials=True,   # Allow credentials (cookies, auth headers)
     allow_methods=["*"],      # Allow all HTTP methods
     allow_headers=["*"],      # Allow all HTTP headers
+    expose_headers=["X-Conversation-ID", "X-Stream-ID", "X-Queue-Position", "X-Queue-Wait-Ms", "X-Coalesced"],  # Readable by the frontend
 )
 
+# Report per-request timing breakdown (auth, db, ...) in a Server-Timing header
+app.add_middleware(ServerTimingMiddleware)
+
 # Include auth routes
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 
-def load_prompt(category: str) -> str:
-    """Load prompt from file for a specific category.
-    
-    Args:
-        category: The category name
-        
-    Returns:
-        str: The prompt text for the category
-    """
-    prompt_file = os.path.join("prompts", f"{category}.txt")
-    try:
-        with open(prompt_file, "r", encoding="utf-8") as f:
-            return f.read().strip()
-    except FileNotFoundError:
-        return ""  # Return empty string if prompt file not found
+@app.on_event("startup")
+async def startup():
+    """Start background maintenance tasks"""
+    password_hashing.start()
+    llm_clients.registry.start()
+    model_catalog.catalog.start()
+    residency.start()
+    await prompt_cache.start()
+    await completion_cache.start()
+    if message_writer.MESSAGE_WRITE_BEHIND:
+        message_writer.writer.start()
 
-def get_groq_models():
-    """Get list of models supported by Groq API
-    
-    If API call fails, returns a basic model list as fallback
-    
-    Returns:
-        List[str]: List of model IDs
-    """
-    if not GROQ_API_KEY:
-        return []
-    
-    try:
-        groq_response = requests.get(
-            "https://api.groq.com/v1/models",
-            headers={"Authorization": f"Bearer {GROQ_API_KEY}"}
-        )
-        
-        if groq_response.status_code == 200:
-            groq_models_data = groq_response.json()
-            models_list = [model["id"] for model in groq_models_data.get("data", [])]
-            print(f"Retrieved {len(models_list)} models from Groq API: {models_list}")
-            return models_list
-        else:
-            print(f"Error fetching Groq models: {groq_response.status_code} - {groq_response.text}")
-            return ["llama3-70b-8192", "llama3-8b-8192", "gemma-7b-it"]
-    except Exception as e:
-        print(f"Exception when fetching Groq models: {str(e)}")
-        return ["llama3-70b-8192", "llama3-8b-8192", "gemma-7b-it"]
-
-# Category-specific prompts
-CATEGORY_PROMPTS = {
-    'goal-setting': load_prompt('goal-setting'),
-    'problem-solving': load_prompt('problem-solving'),
-    'text-summarization': load_prompt('text-summarization'),
-    'emotional-support': load_prompt('emotional-support'),
-    'social-learning': load_prompt('social-learning'),
-    'general': load_prompt('general')
-}
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background tasks and close pooled connections"""
+    # Stop running answers so their partial text is saved
+    await generations.registry.shutdown()
+    # Let answers saved from cancelled streams finish, since they may enqueue their final text
+    await drain_detached()
+    # Write queued messages before anything else shuts down
+    await message_writer.writer.stop()
+    await model_catalog.catalog.stop()
+    await residency.stop()
+    await prompt_cache.stop()
+    await completion_cache.stop()
+    await llm_clients.registry.close()
+    password_hashing.shutdown()
 
 class Message(BaseModel):
     """Message structure for chat communication.
@@ -109,15 +106,13 @@ class ChatRequest(BaseModel):
     
     Attributes:
         user_input: The user's input message.
-        remember_history: Whether to include conversation history.
-        history: List of previous messages in the conversation.
+        remember_history: Whether to include the stored conversation history.
         model_id: The ID of the model to use for generation.
         conversation_id: The ID of the conversation.
         category_id: The ID of the category.
     """
     user_input: str
     remember_history: bool
-    history: Optional[List[Message]] = []
     model_id: int
     conversation_id: Optional[int] = None
     category_id: Optional[int] = None
@@ -140,154 +135,300 @@ class ConversationTitle(BaseModel):
     """Request structure for updating conversation title."""
     title: str
 
+class BulkDeleteRequest(BaseModel):
+    """Request structure for deleting several conversations at once.
+    
+    Attributes:
+        ids: IDs of the conversations to delete.
+        all: Delete all of the current user's conversations instead.
+    """
+    ids: List[int] = []
+    all: bool = False
+
 @app.get("/models")
-async def get_models(
-    db: Session = Depends(database.get_db)
-):
-    """Get list of available models and update their availability status"""
+async def get_models():
+    """Get list of available models from the background-refreshed catalog, with Ollama residency"""
+    models_list = await model_catalog.catalog.get_models()
+    return {"models": residency.annotate(models_list or [])}
+
+def build_prompt_context(system_prompt: str, history: List[Turn], prompt: str) -> str:
+    """Build the flat text prompt used by completion-style models.
+
+    Args:
+        system_prompt: The category system prompt
+        history: Previous messages in the conversation
+        prompt: The current user input
+
+    Returns:
+        str: The prompt text ending with an open assistant turn
+    """
+    parts = [f"{system_prompt}\n\n"]
+    for msg in history or []:
+        if msg.role == "user":
+            parts.append(f"Human: {msg.content}\n")
+        else:
+            parts.append(f"Assistant: {msg.content}\n")
+    parts.append(f"Human: {prompt}\nAssistant:")
+    return "".join(parts)
+
+def build_chat_messages(system_prompt: str, history: List[Turn], prompt: str) -> List[dict]:
+    """Build the role-tagged message list used by chat-style models.
+
+    Args:
+        system_prompt: The category system prompt
+        history: Previous messages in the conversation
+        prompt: The current user input
+
+    Returns:
+        List[dict]: Messages with 'role' and 'content' keys
+    """
+    messages = [{"role": "system", "content": system_prompt}]
+    for msg in history or []:
+        role = "user" if msg.role == "user" else "assistant"
+        messages.append({"role": role, "content": msg.content})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+async def generate_llm_stream(system_prompt: str, history: List[Turn], prompt: str, model_name: str, model_type: str = "ollama", conversation_id: Optional[int] = None):
+    """Stream response chunks from the model provider without blocking the event loop.
+
+    Uses the providers' native async streaming so that the worker keeps serving
+    other requests between chunks. For Ollama conversations with context reuse
+    enabled, a matching context from the previous turn is sent instead of the
+    full prompt so only the new turn is evaluated.
+
+    Args:
+        system_prompt: The category system prompt
+        history: Previous messages in the conversation
+        prompt: The current user input
+        model_name: Name of the model to use
+        model_type: Either 'ollama' or 'groq'
+        conversation_id: The conversation ID, if the turn belongs to a stored conversation
+
+    Yields:
+        str: Response text chunks
+
+    Raises:
+        ValueError: If the model type is unsupported or not configured
+    """
+    # Reuse the warm, pooled client for this model
+    llm = llm_clients.registry.get(model_type, model_name)
+
+    if model_type == "ollama":
+        # Use Ollama for local models
+        reuse_context = ollama_context.OLLAMA_CONTEXT_REUSE and conversation_id is not None
+        context = None
+        if reuse_context:
+            context = ollama_context.context_cache.get(conversation_id, model_name, system_prompt, history)
+            if context is not None and len(context) + count_tokens(prompt) > context_budget(model_name):
+                # The conversation outgrew the window; rebuild from the trimmed history
+                ollama_context.context_cache.invalidate(conversation_id)
+                context = None
+
+        # Keep the model loaded between requests as configured, and count cold starts
+        residency.note_request(model_name)
+        options = {"keep_alive": residency.keep_alive_for(model_name)}
+        if context is not None:
+            prompt_text = f"Human: {prompt}\nAssistant:"
+            options["context"] = context
+        else:
+            prompt_text = build_prompt_context(system_prompt, history, prompt)
+
+        stream = await llm.generate(model=model_name, prompt=prompt_text, stream=True, **options)
+        chunks = []
+        async for part in stream:
+            chunks.append(part["response"])
+            yield part["response"]
+            if part.get("done") and reuse_context and part.get("context"):
+                ollama_context.context_cache.put(
+                    conversation_id, model_name, system_prompt, "".join(chunks), part["context"]
+                )
+    else:
+        # Use Groq for cloud models
+        async for chunk in llm.astream(build_chat_messages(system_prompt, history, prompt)):
+            yield chunk.content
+
+def prepare_prompt(category_id: Optional[int], prompt: str, history: List[Turn], model_name: str, summary: Optional[str] = None) -> Tuple[str, List[Turn]]:
+    """Pick the system prompt and the part of the history that fits the model.
+
+    Args:
+        category_id: The category ID
+        prompt: The current user input
+        history: Previous messages in the conversation
+        model_name: Name of the model to use
+        summary: Stored summary of the earlier conversation, if any
+
+    Returns:
+        Tuple[str, List[Turn]]: The system prompt and the most recent history that fits
+    """
+    # Get the appropriate system prompt for the conversation's category
+    compiled_prompt = prompt_cache.get(category_id)
+    system_prompt = compiled_prompt.text
+    prompt_tokens = compiled_prompt.tokens
+
+    # Older turns are represented by the conversation's stored summary
+    if summary:
+        system_prompt = f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
+        prompt_tokens = count_tokens(system_prompt)
+
+    # Keep the most recent history that fits the model's context window
+    budget = context_budget(model_name) - prompt_tokens - count_tokens(prompt)
+    return system_prompt, trim_to_budget(history, budget)
+
+class CacheLookup(NamedTuple):
+    """Outcome of looking a request up in the response caches.
+
+    Attributes:
+        answer: The cached answer, or None on a miss.
+        key: Completion cache key to store the new answer under, if the category uses that cache.
+        partition: Semantic cache partition, if the question is matched by meaning.
+        vector: Embedding of the question, if the question is matched by meaning.
+    """
+    answer: Optional[str] = None
+    key: Optional[str] = None
+    partition: Optional[str] = None
+    vector: Optional[Any] = None
+
+async def lookup_cached_answer(category_id: Optional[int], system_prompt: str, history: List[Turn], prompt: str, model_name: str, model_type: str) -> CacheLookup:
+    """Look a request up in the response caches its category opts into.
+
+    Runs before the request waits for a model slot, so hits never queue
+    behind generations. Exact matches are checked first; opening questions
+    (no history) are then matched by meaning.
+
+    Args:
+        category_id: The category ID, which decides which caches are used
+        system_prompt: The system prompt (including any conversation summary)
+        history: History that will be sent to the model
+        prompt: The current user input
+        model_name: Name of the model
+        model_type: Either 'ollama' or 'groq'
+
+    Returns:
+        CacheLookup: The cached answer, or what is needed to cache the new one
+    """
+    slug = prompt_cache.slug(category_id)
+    key = None
+    if completion_cache.enabled_for(slug):
+        # Models run with their default sampling options
+        key = make_key(model_type, model_name, system_prompt, history, prompt)
+        answer = await completion_cache.get(key)
+        if answer is not None:
+            return CacheLookup(answer)
+
+    if semantic_cache.enabled_for(slug) and not history:
+        partition = semantic_cache.partition(slug, model_type, model_name)
+        vector = await semantic_cache.embed(prompt)
+        if vector is not None:
+            return CacheLookup(semantic_cache.lookup(partition, vector), key, partition, vector)
+    return CacheLookup(key=key)
+
+async def cached_llm_stream(lookup: CacheLookup, system_prompt: str, history: List[Turn], prompt: str, model_name: str, model_type: str = "ollama", conversation_id: Optional[int] = None):
+    """Replay a cached answer, or stream one from the model and cache it.
+
+    A hit is replayed in chunks so clients see the usual stream. A new
+    answer is stored only when the model finished it, not when it was
+    cancelled or failed part way.
+
+    Args:
+        lookup: Result of ``lookup_cached_answer``
+        system_prompt: The system prompt (including any conversation summary)
+        history: Previous messages in the conversation
+        prompt: The current user input
+        model_name: Name of the model to use
+        model_type: Either 'ollama' or 'groq'
+        conversation_id: The conversation ID, if the turn belongs to a stored conversation
+
+    Yields:
+        str: Response text chunks
+    """
+    if lookup.answer is not None:
+        async for chunk in replay(lookup.answer):
+            yield chunk
+        return
+
+    source = generate_llm_stream(system_prompt, history, prompt, model_name, model_type, conversation_id)
     try:
-        # Get available models from Ollama
-        ollama_models = ollama.list()
-        available_ollama_names = set()
-        
-        if ollama_models and "models" in ollama_models:
-            available_ollama_names = {model.model.split(':')[0] for model in ollama_models["models"]}
-        
-        # Get Groq models
-        groq_models = get_groq_models()
-        
-        # Get all models from database
-        db_models = db.query(models.ModelList).all()
-        db_model_names = {model.name for model in db_models}
-        
-        # Update existing models' availability
-        for model in db_models:
-            if model.model_type == "ollama":
-                model.is_avail = model.name in available_ollama_names
-            elif model.model_type == "groq":
-                model.is_avail = model.name in groq_models
-        
-        # Add new Ollama models to database
-        for model_name in available_ollama_names - db_model_names:
-            new_model = models.ModelList(name=model_name, is_avail=True, model_type="ollama")
-            db.add(new_model)
-        
-        # Add Groq models if they don't exist yet
-        for model_name in groq_models:
-            if model_name not in db_model_names:
-                new_model = models.ModelList(name=model_name, is_avail=True, model_type="groq")
-                db.add(new_model)
-        
-        db.commit()
-        
-        # Return all models with their availability status
-        models_list = db.query(models.ModelList).all()
-        return {
-            "models": [
-                {
-                    "id": model.id,
-                    "name": model.name,
-                    "is_avail": model.is_avail,
-                    "model_type": model.model_type
-                } for model in models_list
-            ]
-        }
-        
-    except Exception as e:
-        # If there's an error, return database models with appropriate availability
-        models_list = db.query(models.ModelList).all()
-        return {
-            "models": [
-                {
-                    "id": model.id,
-                    "name": model.name,
-                    "is_avail": False if model.model_type == "ollama" else bool(GROQ_API_KEY),
-                    "model_type": model.model_type
-                } for model in models_list
-            ]
-        }
+        chunks = []
+        async for chunk in source:
+            chunks.append(chunk)
+            yield chunk
+        answer = "".join(chunks)
+        if lookup.key is not None:
+            await completion_cache.put(lookup.key, answer)
+        if lookup.vector is not None:
+            semantic_cache.insert(lookup.partition, lookup.vector, answer)
+    finally:
+        # Close the model stream right away when the answer is cancelled
+        await source.aclose()
 
-async def stream_ai_response(prompt: str, history: List[Message], model_name: str, conversation_id: int, model_type: str = "ollama"):
-    """Generate AI response using structured conversation history"""
+async def acquire_slot(model_type: str, model_name: str, user_key: str):
+    """Wait for a generation slot on a model.
+
+    Args:
+        model_type: Either 'ollama' or 'groq'
+        model_name: Name of the model
+        user_key: Requester used for fair ordering
+
+    Raises:
+        HTTPException: 429 if the model's queue is full, 503 if the wait timed out
+
+    Returns:
+        Admission: The granted slot
+    """
     try:
-        # Get category for the conversation
-        db = next(database.get_db())
-        conversation = db.query(models.Conversation).filter(
-            models.Conversation.id == conversation_id
-        ).first()
-        
-        # Get the category name for prompt selection
-        category_name = "general"
-        if conversation and conversation.category:
-            category_name = conversation.category.name.lower().replace(" ", "-")
-        
-        # Get the appropriate system prompt based on category
-        system_prompt = CATEGORY_PROMPTS.get(category_name, CATEGORY_PROMPTS['general'])
-        
-        # Build context with system prompt and conversation history
-        context = f"{system_prompt}\n\n"
-        if history:
-            for msg in history:
-                if msg.role == "user":
-                    context += f"Human: {msg.content}\n"
-                else:
-                    context += f"Assistant: {msg.content}\n"
-        
-        # Add current question
-        context += f"Human: {prompt}\nAssistant:"
+        return await scheduler.acquire(model_type, model_name, user_key)
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Model is busy, please try again shortly",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except QueueTimeout:
+        raise HTTPException(status_code=503, detail="Timed out waiting for the model")
 
-        response_text = ""
-        
-        # Use different LLM based on model type
-        if model_type == "ollama":
-            # Use Ollama for local models
-            llm = Ollama(model=model_name)
-            for chunk in llm.stream(context):
-                response_text += chunk
-                yield chunk
-        elif model_type == "groq":
-            # Use Groq for cloud models
-            if not GROQ_API_KEY:
-                yield "[Error] Groq API key is not configured"
-                return
-                
-            llm = ChatGroq(
-                api_key=GROQ_API_KEY,
-                model_name=model_name,
-                streaming=True
-            )
-            
-            # Format messages for ChatGroq
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Add history messages
-            if history:
-                for msg in history:
-                    role = "user" if msg.role == "user" else "assistant"
-                    messages.append({"role": role, "content": msg.content})
-            
-            # Add current question
-            messages.append({"role": "user", "content": prompt})
-            
-            # Stream response
-            for chunk in llm.stream(messages):
-                chunk_text = chunk.content
-                response_text += chunk_text
-                yield chunk_text
-        else:
-            yield f"[Error] Unsupported model type: {model_type}"
-            return
-
-        # Save assistant message
-        assistant_message = models.Message(
-            conversation_id=conversation_id,
-            role="assistant",
-            content=response_text
+async def stream_ai_response(generation: generations.Generation, prompt: str, system_prompt: str, history: List[Turn], lookup: CacheLookup, model_name: str, conversation_id: int, model_type: str = "ollama"):
+    """Generate AI response using structured conversation history
+
+    Runs as the generation's producer. It stops early when no client has
+    been attached for a while, the answer is cancelled through
+    ``/chat/{conversation_id}/cancel`` or a new question is asked in the
+    same conversation; the partial answer is kept.
+    """
+    try:
+        # Collect the answer and save it periodically while it is generated
+        checkpointer = ResponseCheckpointer(conversation_id)
+        stream = generations.until_cancelled(
+            cached_llm_stream(lookup, system_prompt, history, prompt, model_name, model_type, conversation_id),
+            generation
         )
-        db.add(assistant_message)
-        db.commit()
+        try:
+            async for chunk in stream:
+                checkpointer.add(chunk)
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            # The producer is being torn down; keep the partial answer
+            generation.cancel(generations.SHUTDOWN)
+            checkpointer.finish_detached(INTERRUPTED)
+            if checkpointer.text:
+                history_cache.append(conversation_id, "assistant", checkpointer.text)
+            raise
+        except Exception:
+            # Keep whatever was generated before the failure
+            generation.cancel(generations.FAILED)
+            if await checkpointer.finish(INTERRUPTED):
+                history_cache.append(conversation_id, "assistant", checkpointer.text)
+            raise
+        finally:
+            generations.registry.finish(generation, checkpointer.text)
+
+        # A cancelled answer is stored as interrupted
+        response_text = await checkpointer.finish(INTERRUPTED if generation.cancelled.is_set() else COMPLETE)
+        if response_text:
+            history_cache.append(conversation_id, "assistant", response_text)
+
+        # Summarize older turns in the background once the conversation grows long
+        compaction.schedule(conversation_id, model_name, model_type)
 
     except Exception as e:
         yield f"[Error] Failed to generate response: {str(e)}"
@@ -295,45 +436,62 @@ async def stream_ai_response(prompt: str, history: List[Message], model_name: st
 @app.post("/chat")
 async def chat(
     request: ChatRequest,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    http_request: Request,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Handle chat requests and stream AI responses - admin can use any conversation"""
+    admission = None
     try:
         # Get model from database
-        model = db.query(models.ModelList).filter(models.ModelList.id == request.model_id).first()
+        model = await db.get(models.ModelList, request.model_id)
         if not model:
             raise HTTPException(status_code=404, detail="Model not found")
 
-        # Create or get conversation
+        # A new question replaces the conversation's running answer. Stop it before
+        # queueing so it frees its slot, and let it store its partial text before
+        # the new question is saved so the transcript stays in order
+        if request.conversation_id is not None:
+            previous = generations.registry.get(request.conversation_id)
+            if previous is not None and previous.allows(current_user):
+                # Return the connection while waiting on the previous answer
+                await db.commit()
+                await generations.registry.supersede(previous)
+
+        # Get the conversation, if it exists and may be used by the caller
         conversation = None
         if request.conversation_id is not None:
             # Admin can use any conversation, regular user can only use their own
             if current_user.is_admin:
-                conversation = db.query(models.Conversation).filter(
+                conversation = (await db.execute(select(models.Conversation).where(
                     models.Conversation.id == request.conversation_id
-                ).first()
+                ))).scalars().first()
             else:
-                conversation = db.query(models.Conversation).filter(
+                conversation = (await db.execute(select(models.Conversation).where(
                     models.Conversation.id == request.conversation_id,
                     models.Conversation.user_id == current_user.id
-                ).first()
-                
-            if not conversation:
-                conversation = models.Conversation(
-                    user_id=current_user.id,
-                    model_id=model.id,
-                    category_id=request.category_id,
-                    title="New Conversation"
-                )
-                db.add(conversation)
-                db.commit()
-                db.refresh(conversation)
-                print(f"Created new conversation with ID: {conversation.id}")
-            else:
+                ))).scalars().first()
+            if conversation:
                 print(f"Found existing conversation: {conversation.id}")
-        else:
-            # Create new conversation
+
+        # Load stored history before the new message is added to it
+        summary, history = (None, [])
+        if conversation is not None and request.remember_history:
+            summary, history = await history_cache.load(db, conversation.id)
+        category_id = conversation.category_id if conversation is not None else request.category_id
+        system_prompt, history = prepare_prompt(category_id, request.user_input, history, model.name, summary)
+
+        # Cached answers are replayed without waiting for a generation slot
+        lookup = await lookup_cached_answer(
+            category_id, system_prompt, history, request.user_input, model.name, model.model_type
+        )
+        # End the read transaction so a queued request does not hold a pooled connection
+        await db.commit()
+        if lookup.answer is None:
+            admission = await acquire_slot(model.model_type, model.name, f"user:{current_user.id}")
+
+        # Create the conversation if needed
+        if conversation is None:
             print("Creating new conversation")
             conversation = models.Conversation(
                 user_id=current_user.id,
@@ -342,253 +500,517 @@ async def chat(
                 title="New Conversation"
             )
             db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
+            await db.commit()
+            await db.refresh(conversation)
             print(f"Created new conversation with ID: {conversation.id}")
 
         # Save user message
-        user_message = models.Message(
-            conversation_id=conversation.id,
-            role="user",
-            content=request.user_input
-        )
-        db.add(user_message)
-        db.commit()
+        if message_writer.MESSAGE_WRITE_BEHIND:
+            # Written with the next batch, which also updates the conversation's updated_at
+            message_writer.writer.enqueue(conversation.id, "user", request.user_input)
+            # Nothing is committed on this path; end the transaction so the stream does not hold the connection
+            await db.commit()
+        else:
+            user_message = models.Message(
+                conversation_id=conversation.id,
+                role="user",
+                content=request.user_input
+            )
+            db.add(user_message)
+            # Keep the listing ordered by latest activity
+            conversation.updated_at = datetime.utcnow()
+            await db.commit()
+        history_cache.append(conversation.id, "user", request.user_input)
+
+        # Generate in the background; the response follows the replay buffer
+        generation = generations.registry.start(conversation.id, current_user.id, model.name)
+        generations.registry.launch(generation, stream_ai_response(
+            generation,
+            request.user_input,
+            system_prompt,
+            history,
+            lookup,
+            model.name,
+            conversation.id,
+            model.model_type
+        ), admission.release if admission is not None else None)
+        queue_headers, admission = (admission.headers if admission is not None else {}), None
 
-        # Return conversation ID in headers
+        # Return conversation ID, stream ID (for resuming) and queueing in headers
         headers = {
-            "X-Conversation-ID": str(conversation.id)
+            "X-Conversation-ID": str(conversation.id),
+            "X-Stream-ID": generation.stream_id,
+            **queue_headers
         }
 
         # Stream AI response
         return StreamingResponse(
-            stream_ai_response(
-                request.user_input,
-                request.history if request.remember_history else [],
-                model.name,
-                conversation.id,
-                model.model_type
-            ),
+            generation.subscribe(0, http_request),
             media_type="text/plain",
             headers=headers
         )
+    except HTTPException:
+        if admission is not None:
+            admission.release()
+        raise
     except Exception as e:
+        if admission is not None:
+            admission.release()
         print(f"Chat error: {str(e)}")
         return StreamingResponse(
             iter([f"Error: {str(e)}"]),
             media_type="text/plain"
         )
 
+@app.post("/chat/{conversation_id}/cancel")
+async def cancel_chat(
+    conversation_id: int,
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Stop the answer being generated for a conversation - admin can cancel any conversation
+
+    The partial answer is stored with status 'interrupted'.
+    """
+    generation = generations.registry.get(conversation_id)
+    if generation is None or (not current_user.is_admin and generation.user_id != current_user.id):
+        raise HTTPException(status_code=404, detail="No answer is being generated for this conversation")
+    return {"cancelled": generations.registry.cancel(conversation_id)}
+
+@app.get("/chat/stream/{stream_id}")
+async def resume_stream(
+    stream_id: str,
+    http_request: Request,
+    offset: int = Query(0, ge=0),
+    current_user: Optional[auth.Principal] = Depends(auth.get_optional_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Resume an answer stream from a byte offset after a lost connection
+
+    Generation keeps running server-side while the client reconnects. The
+    stream stays available for a grace period after the answer finishes.
+    """
+    generation = generations.registry.get_stream(stream_id)
+    if generation is None or not generation.allows(current_user):
+        raise HTTPException(status_code=404, detail="Stream not found")
+    if offset > generation.buffer.end:
+        raise HTTPException(status_code=416, detail="Offset is past the end of the stream")
+    try:
+        # Fail before the response starts if the offset was already dropped
+        generation.buffer.read(offset)
+    except generations.StreamExpired:
+        raise HTTPException(status_code=410, detail="Offset is no longer available")
+
+    # Authenticating may have read the user; return the connection before streaming
+    await db.close()
+
+    metrics.incr("generation.resumed")
+    return StreamingResponse(
+        generation.subscribe(offset, http_request),
+        media_type="text/plain",
+        headers={"X-Stream-ID": generation.stream_id}
+    )
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Encode a row's position in a keyset-paginated listing as an opaque cursor.
+
+    Args:
+        timestamp: The row's sort timestamp (e.g. updated_at or created_at)
+        row_id: The row ID (tie-breaker)
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string
+
+    Raises:
+        HTTPException: If the cursor is malformed
+
+    Returns:
+        Tuple[datetime, int]: The timestamp and row ID it points at
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/conversations")
 async def get_conversations(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    """Get all conversations for the current user or all conversations for admin"""
+    """List conversation summaries, most recently updated first - admin sees all conversations
+
+    Pages are keyed on (updated_at, id): pass the returned ``next_cursor`` to
+    get the next page. Each entry carries metadata only (title, model,
+    category, message count and a preview of the last message); messages
+    are fetched per conversation from ``/conversations/{id}/messages``.
+    """
+    # Per-conversation message count and last message, evaluated only for the page's rows
+    message_count = select(func.count(models.Message.id)).where(
+        models.Message.conversation_id == models.Conversation.id
+    ).correlate(models.Conversation).scalar_subquery()
+    last_message_id = select(models.Message.id).where(
+        models.Message.conversation_id == models.Conversation.id
+    ).correlate(models.Conversation).order_by(
+        models.Message.created_at.desc(), models.Message.id.desc()
+    ).limit(1).scalar_subquery()
+    last_message = aliased(models.Message)
+
+    query = select(
+        models.Conversation,
+        models.ModelList.name,
+        models.Category.name,
+        message_count,
+        last_message.role,
+        func.substr(last_message.content, 1, CONVERSATION_PREVIEW_CHARS),
+        last_message.created_at
+    ).outerjoin(
+        models.ModelList, models.ModelList.id == models.Conversation.model_id
+    ).outerjoin(
+        models.Category, models.Category.id == models.Conversation.category_id
+    ).outerjoin(
+        last_message, last_message.id == last_message_id
+    )
+
+    if not current_user.is_admin:
+        # Regular user can only see their own conversations
+        query = query.where(models.Conversation.user_id == current_user.id)
+
+    if cursor:
+        cursor_updated_at, cursor_id = decode_cursor(cursor)
+        query = query.where(or_(
+            models.Conversation.updated_at < cursor_updated_at,
+            and_(models.Conversation.updated_at == cursor_updated_at, models.Conversation.id < cursor_id)
+        ))
+
     try:
-        if current_user.is_admin:
-            # Admin can see all conversations
-            conversations = db.query(models.Conversation).all()
-        else:
-            # Regular user can only see their own conversations
-            conversations = db.query(models.Conversation).filter(
-                models.Conversation.user_id == current_user.id
-            ).all()
+        rows = (await db.execute(
+            query.order_by(models.Conversation.updated_at.desc(), models.Conversation.id.desc()).limit(limit + 1)
+        )).all()
 
-        return {
-            "conversations": [
-                {
-                    "id": conv.id,
-                    "title": conv.title,
-                    "messages": [
-                        {
-                            "role": msg.role,
-                            "content": msg.content,
-                            "created_at": msg.created_at.isoformat()
-                        } for msg in conv.messages
-                    ],
-                    "model": conv.model.name if conv.model else None,
-                    "category": conv.category.name if conv.category else None,
-                    "created_at": conv.created_at.isoformat(),
-                    "updated_at": conv.updated_at.isoformat()
-                } for conv in conversations
-            ]
-        }
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        conversations = []
+        for conv, model_name, category_name, count, last_role, last_preview, last_created_at in rows:
+            conversations.append({
+                "id": conv.id,
+                "title": conv.title,
+                "model": model_name,
+                "category": category_name,
+                "message_count": count,
+                "last_message": {
+                    "role": last_role,
+                    "preview": last_preview,
+                    "created_at": last_created_at.isoformat()
+                } if last_role is not None else None,
+                "created_at": conv.created_at.isoformat(),
+                "updated_at": conv.updated_at.isoformat()
+            })
+
+        next_cursor = None
+        if has_more:
+            last_conv = rows[-1][0]
+            next_cursor = encode_cursor(last_conv.updated_at, last_conv.id)
+
+        return {"conversations": conversations, "next_cursor": next_cursor}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/conversations/{conversation_id}/messages")
+async def get_conversation_messages(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Get one page of a conversation's messages - admin can read any conversation
+
+    Without a cursor the latest ``limit`` messages are returned. ``before``
+    pages back to older messages and ``after`` forward to newer ones; both
+    are cursors on (created_at, id) taken from a previous response. Messages
+    in a page are always in chronological order.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    query = select(
+        models.Conversation,
+        models.ModelList.name,
+        models.Category.name
+    ).outerjoin(
+        models.ModelList, models.ModelList.id == models.Conversation.model_id
+    ).outerjoin(
+        models.Category, models.Category.id == models.Conversation.category_id
+    ).where(models.Conversation.id == conversation_id)
+    if not current_user.is_admin:
+        # Regular user can only read their own conversations
+        query = query.where(models.Conversation.user_id == current_user.id)
+
+    row = (await db.execute(query)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    conversation, model_name, category_name = row
+
+    # Include this conversation's messages still waiting in the write-behind queue
+    await message_writer.writer.flush_conversation(conversation_id)
+
+    message_query = select(models.Message).where(models.Message.conversation_id == conversation_id)
+    if after:
+        cursor_created_at, cursor_id = decode_cursor(after)
+        message_query = message_query.where(or_(
+            models.Message.created_at > cursor_created_at,
+            and_(models.Message.created_at == cursor_created_at, models.Message.id > cursor_id)
+        )).order_by(models.Message.created_at, models.Message.id)
+    else:
+        if before:
+            cursor_created_at, cursor_id = decode_cursor(before)
+            message_query = message_query.where(or_(
+                models.Message.created_at < cursor_created_at,
+                and_(models.Message.created_at == cursor_created_at, models.Message.id < cursor_id)
+            ))
+        message_query = message_query.order_by(models.Message.created_at.desc(), models.Message.id.desc())
+
+    try:
+        messages = (await db.execute(message_query.limit(limit + 1))).scalars().all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        # Fetched newest first; return in chronological order
+        messages.reverse()
+
+    # Cursors continuing in the direction of travel are only returned while more rows exist;
+    # the opposite end of the page is always a valid cursor
+    before_cursor = after_cursor = None
+    if messages:
+        first, last = messages[0], messages[-1]
+        if after or has_more:
+            before_cursor = encode_cursor(first.created_at, first.id)
+        if before or (after and has_more):
+            after_cursor = encode_cursor(last.created_at, last.id)
+
+    return {
+        "conversation": {
+            "id": conversation.id,
+            "title": conversation.title,
+            "model": model_name,
+            "category": category_name,
+            "created_at": conversation.created_at.isoformat(),
+            "updated_at": conversation.updated_at.isoformat()
+        },
+        "messages": [
+            {
+                "id": msg.id,
+                "role": msg.role,
+                "content": msg.content,
+                "status": msg.status,
+                "created_at": msg.created_at.isoformat()
+            } for msg in messages
+        ],
+        "before_cursor": before_cursor,
+        "after_cursor": after_cursor
+    }
+
+async def delete_conversations(db: AsyncSession, *conditions) -> List[int]:
+    """Delete the matching conversations in one statement and transaction.
+
+    Messages and summaries are removed by the database's ON DELETE CASCADE.
+
+    Args:
+        db: The database session
+        conditions: Filters selecting the conversations to delete
+
+    Returns:
+        List[int]: IDs of the deleted conversations
+    """
+    deleted = (await db.execute(
+        delete(models.Conversation).where(*conditions).returning(models.Conversation.id)
+    )).scalars().all()
+    await db.commit()
+    for conversation_id in deleted:
+        generations.registry.cancel(conversation_id)
+        history_cache.invalidate(conversation_id)
+        ollama_context.context_cache.invalidate(conversation_id)
+    return deleted
+
 @app.delete("/conversations/{conversation_id}")
 async def delete_conversation(
     conversation_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Delete a conversation - admin can delete any conversation"""
+    conditions = [models.Conversation.id == conversation_id]
+    if not current_user.is_admin:
+        # Regular user can only delete their own
+        conditions.append(models.Conversation.user_id == current_user.id)
+
     try:
-        # Admin can delete any conversation, regular user can only delete their own
-        if current_user.is_admin:
-            conversation = db.query(models.Conversation).filter(
-                models.Conversation.id == conversation_id
-            ).first()
-        else:
-            conversation = db.query(models.Conversation).filter(
-                models.Conversation.id == conversation_id,
-                models.Conversation.user_id == current_user.id
-            ).first()
-        
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        # Delete all messages associated with the conversation
-        db.query(models.Message).filter(
-            models.Message.conversation_id == conversation_id
-        ).delete()
-        
-        # Delete the conversation
-        db.delete(conversation)
-        db.commit()
-        
-        return {"message": "Conversation deleted successfully"}
+        deleted = await delete_conversations(db, *conditions)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error deleting conversation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def stream_guest_ai_response(prompt: str, history: List[Message], model_name: str, category_id: int = 1, model_type: str = "ollama"):
-    """Generate AI response for guest users without saving to database"""
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return {"message": "Conversation deleted successfully"}
+
+@app.post("/conversations/bulk-delete")
+async def bulk_delete_conversations(
+    request: BulkDeleteRequest,
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Delete a list of conversations, or all of the current user's conversations, in one transaction
+
+    With ``all`` set, only the caller's own conversations are deleted (also
+    for admins). Listed IDs that do not exist or belong to another user are
+    skipped unless the caller is an admin.
+    """
+    if request.all:
+        conditions = [models.Conversation.user_id == current_user.id]
+    elif request.ids:
+        conditions = [models.Conversation.id.in_(request.ids)]
+        if not current_user.is_admin:
+            conditions.append(models.Conversation.user_id == current_user.id)
+    else:
+        raise HTTPException(status_code=400, detail="Provide conversation ids or set all")
+
     try:
-        # Get category name from id
-        db = next(database.get_db())
-        category = db.query(models.Category).filter(models.Category.id == category_id).first()
-        
-        # Get the category name for prompt selection
-        category_name = "general"
-        if category:
-            category_name = category.name.lower().replace(" ", "-")
-        
-        # Get the appropriate system prompt based on category
-        system_prompt = CATEGORY_PROMPTS.get(category_name, CATEGORY_PROMPTS['general'])
-        
-        # Build context with system prompt and conversation history
-        context = f"{system_prompt}\n\n"
-        if history:
-            for msg in history:
-                if msg.role == "user":
-                    context += f"Human: {msg.content}\n"
-                else:
-                    context += f"Assistant: {msg.content}\n"
-        
-        # Add current question
-        context += f"Human: {prompt}\nAssistant:"
+        deleted = await delete_conversations(db, *conditions)
+    except Exception as e:
+        await db.rollback()
+        print(f"Error deleting conversations: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        response_text = ""
-        
-        # Use different LLM based on model type
-        if model_type == "ollama":
-            # Use Ollama for local models
-            llm = Ollama(model=model_name)
-            for chunk in llm.stream(context):
-                response_text += chunk
+    return {"deleted": len(deleted), "ids": deleted}
+
+async def stream_guest_ai_response(generation: generations.Generation, prompt: str, system_prompt: str, history: List[Turn], lookup: CacheLookup, model_name: str, model_type: str = "ollama"):
+    """Generate AI response for guest users without saving to database
+
+    Runs as the generation's producer; it stops early when no client has
+    been attached for a while.
+    """
+    try:
+        chunks = []
+        stream = generations.until_cancelled(
+            cached_llm_stream(lookup, system_prompt, history, prompt, model_name, model_type),
+            generation
+        )
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
                 yield chunk
-        elif model_type == "groq":
-            # Use Groq for cloud models
-            if not GROQ_API_KEY:
-                yield "[Error] Groq API key is not configured"
-                return
-                
-            llm = ChatGroq(
-                api_key=GROQ_API_KEY,
-                model_name=model_name,
-                streaming=True
-            )
-            
-            # Format messages for ChatGroq
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Add history messages
-            if history:
-                for msg in history:
-                    role = "user" if msg.role == "user" else "assistant"
-                    messages.append({"role": role, "content": msg.content})
-            
-            # Add current question
-            messages.append({"role": "user", "content": prompt})
-            
-            # Stream response
-            for chunk in llm.stream(messages):
-                chunk_text = chunk.content
-                response_text += chunk_text
-                yield chunk_text
-        else:
-            yield f"[Error] Unsupported model type: {model_type}"
-            return
+        except (asyncio.CancelledError, GeneratorExit):
+            generation.cancel(generations.SHUTDOWN)
+            raise
+        except Exception:
+            generation.cancel(generations.FAILED)
+            raise
+        finally:
+            generations.registry.finish(generation, "".join(chunks))
 
     except Exception as e:
         yield f"[Error] Failed to generate response: {str(e)}"
 
 @app.post("/guest/chat")
-async def guest_chat(request: GuestChatRequest):
+async def guest_chat(request: GuestChatRequest, http_request: Request):
     """Handle guest chat requests and stream AI responses without saving to database"""
+    admission = None
     try:
-        # Determine model type based on the model name
-        db = next(database.get_db())
-        model = db.query(models.ModelList).filter(models.ModelList.name == request.model).first()
-        
-        if not model:
-            # Check if it's a valid Ollama model
-            ollama_models = ollama.list()
-            available_ollama_names = set()
-            
-            if ollama_models and "models" in ollama_models:
-                available_ollama_names = {model.model.split(':')[0] for model in ollama_models["models"]}
-            
-            # Get all Groq model names
-            groq_models = get_groq_models()
-            
-            if request.model in available_ollama_names:
-                # If in Ollama models, then it's Ollama type
-                model_type = "ollama"
-            elif request.model in groq_models:
-                # If in Groq models, then it's Groq type
-                model_type = "groq"
-            else:
-                raise HTTPException(status_code=404, detail="Model not found")
-        else:
-            model_type = model.model_type
+        # Resolve model type and availability from the in-memory catalog index
+        model = await model_catalog.catalog.resolve(request.model)
+        if model is None:
+            raise HTTPException(status_code=404, detail="Model not found")
+        model_type = model["model_type"]
 
         # Check availability for the model type
         if model_type == "ollama":
-            # Check if Ollama model is available
-            ollama_models = ollama.list()
-            available_names = set()
-            
-            if ollama_models and "models" in ollama_models:
-                available_names = {model.model.split(':')[0] for model in ollama_models["models"]}
-            
-            if request.model not in available_names:
+            if not model["is_avail"]:
                 raise HTTPException(status_code=404, detail="Ollama model not available")
         elif model_type == "groq":
             # Check if Groq API key is available
             if not GROQ_API_KEY:
                 raise HTTPException(status_code=500, detail="Groq API key not configured")
 
+        history = [make_turn(msg.role, msg.content) for msg in request.history or []]
+        # The guest client includes the question itself as the last history entry
+        if history and history[-1].role == "user" and history[-1].content == request.user_input:
+            history.pop()
+        system_prompt, history = prepare_prompt(request.category, request.user_input, history, request.model)
+
+        # Identical requests (e.g. the welcome-screen suggestions) share one running generation
+        key = generations.coalesce_key(model_type, request.model, system_prompt, history, request.user_input)
+        generation = generations.registry.join(key)
+        lookup = CacheLookup()
+        if generation is None:
+            # Cached answers are replayed without waiting for a generation slot
+            lookup = await lookup_cached_answer(
+                request.category, system_prompt, history, request.user_input, request.model, model_type
+            )
+        if generation is None and lookup.answer is None:
+            # Guests share fair ordering by client address
+            client_host = http_request.client.host if http_request.client else "unknown"
+            admission = await acquire_slot(model_type, request.model, f"guest:{client_host}")
+            # An identical request may have started while this one was queued
+            generation = generations.registry.join(key)
+            if generation is not None:
+                admission.release()
+                admission = None
+
+        if generation is not None:
+            metrics.incr("coalesce.hits")
+            return StreamingResponse(
+                generation.subscribe(0, http_request),
+                media_type="text/plain",
+                headers={"X-Stream-ID": generation.stream_id, "X-Coalesced": "true"}
+            )
+        metrics.incr("coalesce.misses")
+
+        # Generate in the background; the response follows the replay buffer
+        generation = generations.registry.start(None, None, request.model, coalesce_key=key)
+        generations.registry.launch(generation, stream_guest_ai_response(
+            generation,
+            request.user_input,
+            system_prompt,
+            history,
+            lookup,
+            request.model,
+            model_type
+        ), admission.release if admission is not None else None)
+        queue_headers, admission = (admission.headers if admission is not None else {}), None
+
         return StreamingResponse(
-            stream_guest_ai_response(
-                request.user_input,
-                request.history,
-                request.model,
-                request.category,
-                model_type
-            ),
-            media_type="text/plain"
+            generation.subscribe(0, http_request),
+            media_type="text/plain",
+            headers={"X-Stream-ID": generation.stream_id, **queue_headers}
         )
 
     except HTTPException as e:
+        if admission is not None:
+            admission.release()
         print(f"HTTP Exception: {str(e)}")
         raise e
     except Exception as e:
+        if admission is not None:
+            admission.release()
         print(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -596,41 +1018,41 @@ async def guest_chat(request: GuestChatRequest):
 async def update_conversation_title(
     conversation_id: int,
     request: ConversationTitle,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Update conversation title - admin can update any conversation"""
     try:
         # Admin can update any conversation, regular user can only update their own
         if current_user.is_admin:
-            conversation = db.query(models.Conversation).filter(
+            conversation = (await db.execute(select(models.Conversation).where(
                 models.Conversation.id == conversation_id
-            ).first()
+            ))).scalars().first()
         else:
-            conversation = db.query(models.Conversation).filter(
+            conversation = (await db.execute(select(models.Conversation).where(
                 models.Conversation.id == conversation_id,
                 models.Conversation.user_id == current_user.id
-            ).first()
+            ))).scalars().first()
             
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
         # Update title
         conversation.title = request.title
-        db.commit()
+        await db.commit()
         
         return {"message": "Title updated successfully"}
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error updating conversation title: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Admin routes - only accessible to admin users
 @app.get("/admin/tables")
 async def get_tables(
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(database.get_db)
+    current_user: auth.Principal = Depends(auth.get_current_user),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """Get all database tables data for admin"""
     # Check if user is admin
@@ -639,7 +1061,7 @@ async def get_tables(
     
     try:
         # Get users table data
-        users = db.query(models.User).all()
+        users = (await db.execute(select(models.User))).scalars().all()
         users_data = [
             {
                 "id": user.id,
@@ -651,7 +1073,7 @@ async def get_tables(
         ]
         
         # Get categories table data
-        categories = db.query(models.Category).all()
+        categories = (await db.execute(select(models.Category))).scalars().all()
         categories_data = [
             {
                 "id": category.id,
@@ -660,7 +1082,7 @@ async def get_tables(
         ]
         
         # Get models table data
-        models_list = db.query(models.ModelList).all()
+        models_list = (await db.execute(select(models.ModelList))).scalars().all()
         models_data = [
             {
                 "id": model.id,
@@ -671,7 +1093,7 @@ async def get_tables(
         ]
         
         # Get conversations table data (limit to 100 to avoid huge payloads)
-        conversations = db.query(models.Conversation).limit(100).all()
+        conversations = (await db.execute(select(models.Conversation).limit(100))).scalars().all()
         conversations_data = [
             {
                 "id": conv.id,
@@ -685,7 +1107,7 @@ async def get_tables(
         ]
         
         # Get messages table data (limit to 100 to avoid huge payloads)
-        messages = db.query(models.Message).limit(100).all()
+        messages = (await db.execute(select(models.Message).limit(100))).scalars().all()
         messages_data = [
             {
                 "id": msg.id,
@@ -706,3 +1128,25 @@ async def get_tables(
     except Exception as e:
         print(f"Error getting admin tables: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/metrics")
+async def get_metrics(
+    current_user: auth.Principal = Depends(auth.get_current_user)
+):
+    """Get process-wide performance counters and timers for admin"""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Forbidden - Admin access required")
+    snapshot = metrics.snapshot()
+    hits = snapshot["counters"].get("coalesce.hits", 0)
+    misses = snapshot["counters"].get("coalesce.misses", 0)
+    return {
+        **snapshot,
+        "scheduler": scheduler.snapshot(),
+        "completion_cache": completion_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "coalescing": {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0
+        }
+    }
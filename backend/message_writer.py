@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
+import database
+import models
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Queue chat messages and write them in batches instead of one commit per message
+MESSAGE_WRITE_BEHIND = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() == "true"
+# Flush as soon as this many messages are queued
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "100"))
+# Longest time (milliseconds) a queued message waits before it is written
+MESSAGE_WRITE_FLUSH_MS = float(os.getenv("MESSAGE_WRITE_FLUSH_MS", "50"))
+
+class MessageWriter:
+    """Write-behind queue for chat messages.
+
+    Messages from all streams are queued in order and written with one
+    multi-row INSERT per batch, together with the ``updated_at`` of their
+    conversations, in a single transaction. A batch is written once
+    ``batch_size`` messages are queued or the oldest has waited
+    ``flush_interval`` seconds, and the queue is drained on shutdown.
+
+    Queued messages keep their enqueue time as ``created_at``. Readers of a
+    conversation call ``flush_conversation`` first, so a conversation always
+    sees its own messages even before the next scheduled flush.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._rows: List[dict] = []
+        self._pending: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def enqueue(self, conversation_id: int, role: str, content: str):
+        """Queue a message for the next batch.
+
+        Args:
+            conversation_id: The conversation ID
+            role: 'user' or 'assistant'
+            content: The message text
+        """
+        self._rows.append({
+            "conversation_id": conversation_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.utcnow(),
+        })
+        self._pending[conversation_id] = self._pending.get(conversation_id, 0) + 1
+        metrics.gauge("message_writer.pending", 1)
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+
+    def has_pending(self, conversation_id: int) -> bool:
+        """Check whether a conversation has messages not yet written."""
+        return conversation_id in self._pending
+
+    async def flush_conversation(self, conversation_id: int):
+        """Write everything queued so far if the conversation has queued messages.
+
+        Args:
+            conversation_id: The conversation about to be read
+        """
+        if self.has_pending(conversation_id):
+            metrics.incr("message_writer.read_flushes")
+            await self.flush()
+
+    async def flush(self):
+        """Write all queued messages, one batch at a time."""
+        async with self._lock:
+            while self._rows:
+                batch = self._rows[:self.batch_size]
+                written = await self._write(batch)
+                if written == 0:
+                    # Leave the rest queued and retry on the next flush
+                    break
+                self._done(batch[:written])
+
+    def _done(self, rows: List[dict]):
+        del self._rows[:len(rows)]
+        for row in rows:
+            conversation_id = row["conversation_id"]
+            remaining = self._pending[conversation_id] - 1
+            if remaining:
+                self._pending[conversation_id] = remaining
+            else:
+                del self._pending[conversation_id]
+        metrics.gauge("message_writer.pending", -len(rows))
+
+    async def _write(self, rows: List[dict]) -> int:
+        """Write a batch; returns how many leading rows are done (written or dropped)."""
+        start = time.perf_counter()
+        try:
+            async with database.session_scope() as db:
+                await db.execute(models.Message.__table__.insert(), rows)
+                latest: Dict[int, datetime] = {}
+                for row in rows:
+                    latest[row["conversation_id"]] = row["created_at"]
+                await db.execute(
+                    models.Conversation.__table__.update().where(
+                        models.Conversation.__table__.c.id == bindparam("conversation_id")
+                    ).values(updated_at=bindparam("updated_at")),
+                    [{"conversation_id": cid, "updated_at": ts} for cid, ts in latest.items()]
+                )
+                await db.commit()
+        except IntegrityError:
+            # Usually a conversation deleted while its messages were queued
+            return await self._write_each(rows)
+        except Exception as e:
+            logger.error(f"Writing {len(rows)} queued messages failed: {str(e)}")
+            metrics.incr("message_writer.errors")
+            return 0
+        metrics.incr("message_writer.flushes")
+        metrics.incr("message_writer.rows", len(rows))
+        metrics.observe("message_writer.flush", time.perf_counter() - start)
+        return len(rows)
+
+    async def _write_each(self, rows: List[dict]) -> int:
+        for index, row in enumerate(rows):
+            try:
+                async with database.session_scope() as db:
+                    await db.execute(models.Message.__table__.insert(), [row])
+                    await db.commit()
+            except IntegrityError:
+                logger.warning(f"Dropped queued message for missing conversation {row['conversation_id']}")
+                metrics.incr("message_writer.dropped")
+            except Exception as e:
+                logger.error(f"Writing queued message failed: {str(e)}")
+                metrics.incr("message_writer.errors")
+                return index
+            else:
+                metrics.incr("message_writer.rows")
+        return len(rows)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Message flush failed: {str(e)}")
+
+    def start(self):
+        """Start the background flusher."""
+        self._stopping = False
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher and write everything still queued."""
+        if self._task is not None:
+            # Let a write in progress finish rather than cancelling it mid-commit
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._rows:
+            logger.error(f"{len(self._rows)} queued messages could not be written at shutdown")
+
+writer = MessageWriter(MESSAGE_WRITE_BATCH_SIZE, MESSAGE_WRITE_FLUSH_MS / 1000)
@@ -0,0 +1,115 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+class Metrics:
+    """Process-wide counters and timers exposed to admins.
+
+    Counters are plain integers that only grow; gauges track a current
+    level (e.g. open sessions); timers keep a count, total and maximum so
+    that averages can be derived without storing individual samples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timers: Dict[str, list] = {}
+
+    def incr(self, name: str, value: int = 1):
+        """Add to a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, delta: float):
+        """Move a gauge up or down."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def observe(self, name: str, seconds: float):
+        """Record one duration sample for a timer."""
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    def snapshot(self) -> dict:
+        """Get the current value of every counter and timer.
+
+        Returns:
+            dict: Counters and gauges by name, and timers with count, avg_ms,
+            max_ms and total_ms
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timers": {
+                    name: {
+                        "count": count,
+                        "avg_ms": round(total / count * 1000, 3) if count else 0.0,
+                        "max_ms": round(worst * 1000, 3),
+                        "total_ms": round(total * 1000, 3),
+                    } for name, (count, total, worst) in self._timers.items()
+                },
+            }
+
+metrics = Metrics()
+
+def record_timing(name: str, seconds: float):
+    """Add a duration to the current request's timing breakdown and the global timer.
+
+    Args:
+        name: Phase name, e.g. 'auth' or 'db'
+        seconds: Duration of the phase
+    """
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+    metrics.observe(name, seconds)
+
+@contextmanager
+def timed(name: str):
+    """Time a block and record it with ``record_timing``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+class ServerTimingMiddleware:
+    """ASGI middleware reporting the per-request timing breakdown.
+
+    Phases recorded during the request (auth, db, ...) are sent in a
+    ``Server-Timing`` response header together with ``app``, the time until
+    the response headers were sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timings["app"] = time.perf_counter() - start
+                value = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -0,0 +1,131 @@
+import logging
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+logger = logging.getLogger(__name__)
+
+class Migration(NamedTuple):
+    """One schema change, applied once and recorded in ``schema_migrations``.
+
+    Attributes:
+        version: Increasing version number; migrations run in this order.
+        description: Short description stored alongside the version.
+        apply: Function performing the change on an open transaction.
+    """
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+def _create_index(name: str, table: str, columns: str) -> Callable[[Connection], None]:
+    def apply(conn: Connection):
+        # IF NOT EXISTS keeps the migration safe on databases created by create_all
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+    return apply
+
+def _has_foreign_key(conn: Connection, table: str, column: str, referred_table: str) -> bool:
+    return any(
+        fk["constrained_columns"] == [column] and fk["referred_table"] == referred_table
+        for fk in inspect(conn).get_foreign_keys(table)
+    )
+
+def _add_foreign_key(table: str, column: str, referred_table: str, name: str) -> Callable[[Connection], None]:
+    def apply(conn: Connection):
+        if _has_foreign_key(conn, table, column, referred_table):
+            return
+        if conn.dialect.name != "postgresql":
+            # SQLite cannot add constraints to an existing table; tables it
+            # creates from the models already carry the foreign key
+            logger.warning(f"Skipping foreign key {name}: not supported by {conn.dialect.name}")
+            return
+        # NOT VALID enforces the key for new rows without rejecting or
+        # deleting existing ones
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) "
+            f"REFERENCES {referred_table} (id) ON DELETE CASCADE ON UPDATE CASCADE NOT VALID"
+        ))
+    return apply
+
+def _add_column(table: str, column: str, ddl: str) -> Callable[[Connection], None]:
+    def apply(conn: Connection):
+        if any(existing["name"] == column for existing in inspect(conn).get_columns(table)):
+            return
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return apply
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Index messages by conversation and time",
+              _create_index("ix_messages_conversation_created_id", "messages", "conversation_id, created_at, id")),
+    Migration(2, "Index conversations by owner and last update",
+              _create_index("ix_conversations_user_updated_id", "conversations", "user_id, updated_at, id")),
+    Migration(3, "Index conversations by last update",
+              _create_index("ix_conversations_updated_id", "conversations", "updated_at, id")),
+    Migration(4, "Foreign key from messages to conversations",
+              _add_foreign_key("messages", "conversation_id", "conversations", "fk_messages_conversation_id")),
+    Migration(5, "Foreign key from conversations to users",
+              _add_foreign_key("conversations", "user_id", "users", "fk_conversations_user_id")),
+    Migration(6, "Status of partially generated messages",
+              _add_column("messages", "status", "VARCHAR(20) NOT NULL DEFAULT 'complete'")),
+]
+
+def _ensure_version_table(engine: Engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(200) NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL)"
+        ))
+
+def applied_versions(engine: Engine) -> set:
+    """Get the versions already recorded in ``schema_migrations``."""
+    _ensure_version_table(engine)
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+def migrate(engine: Engine) -> List[int]:
+    """Bring the database schema up to date without touching existing data.
+
+    Missing tables are created from the models, then every migration not yet
+    recorded in ``schema_migrations`` is applied in version order, each in its
+    own transaction together with its version row.
+
+    Args:
+        engine: Engine of the database to migrate
+
+    Returns:
+        List[int]: Versions applied by this call
+    """
+    models.Base.metadata.create_all(bind=engine)
+    done = applied_versions(engine)
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        try:
+            with engine.begin() as conn:
+                migration.apply(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, description, applied_at) "
+                         "VALUES (:version, :description, :applied_at)"),
+                    {"version": migration.version, "description": migration.description,
+                     "applied_at": datetime.utcnow()}
+                )
+        except IntegrityError:
+            # Another process recorded this version first
+            continue
+        applied.append(migration.version)
+        logger.info(f"Applied migration {migration.version}: {migration.description}")
+    return applied
+
+if __name__ == "__main__":
+    import database
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    versions = migrate(database.engine)
+    logger.info(f"Applied {len(versions)} migration(s)" if versions else "Database schema is up to date")
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+import ollama
+import requests
+from dotenv import load_dotenv
+
+import database
+import models
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+MODEL_CATALOG_REFRESH_SECONDS = float(os.getenv("MODEL_CATALOG_REFRESH_SECONDS", "60"))
+
+def get_groq_models():
+    """Get list of models supported by Groq API
+
+    If API call fails, returns a basic model list as fallback
+
+    Returns:
+        List[str]: List of model IDs
+    """
+    if not GROQ_API_KEY:
+        return []
+
+    try:
+        groq_response = requests.get(
+            "https://api.groq.com/v1/models",
+            headers={"Authorization": f"Bearer {GROQ_API_KEY}"},
+            timeout=10
+        )
+
+        if groq_response.status_code == 200:
+            groq_models_data = groq_response.json()
+            models_list = [model["id"] for model in groq_models_data.get("data", [])]
+            logger.info(f"Retrieved {len(models_list)} models from Groq API: {models_list}")
+            return models_list
+        else:
+            logger.error(f"Error fetching Groq models: {groq_response.status_code} - {groq_response.text}")
+            return ["llama3-70b-8192", "llama3-8b-8192", "gemma-7b-it"]
+    except Exception as e:
+        logger.error(f"Exception when fetching Groq models: {str(e)}")
+        return ["llama3-70b-8192", "llama3-8b-8192", "gemma-7b-it"]
+
+async def get_ollama_model_names() -> Set[str]:
+    """Get the names of models installed in the local Ollama server.
+
+    Returns:
+        Set[str]: Model names without their tag, empty if Ollama is unreachable
+    """
+    try:
+        ollama_models = await ollama.AsyncClient(host=OLLAMA_HOST).list()
+    except Exception as e:
+        logger.warning(f"Could not list Ollama models: {str(e)}")
+        return set()
+    if ollama_models and "models" in ollama_models:
+        return {model.model.split(':')[0] for model in ollama_models["models"]}
+    return set()
+
+def _serialize(model: models.ModelList) -> dict:
+    return {
+        "id": model.id,
+        "name": model.name,
+        "is_avail": model.is_avail,
+        "model_type": model.model_type
+    }
+
+class ModelCatalog:
+    """In-memory catalog of models and their availability.
+
+    The catalog is refreshed by a background task every ``refresh_interval``
+    seconds. Readers are always served from memory: a stale snapshot is
+    returned immediately while a refresh runs in the background, and
+    concurrent refreshes are coalesced into a single one. The database is
+    only written when a model's availability actually changes or a new model
+    appears. Every refresh also rebuilds a name index so that request
+    handlers can resolve a model without any outbound call.
+    """
+
+    def __init__(self, refresh_interval: float = 60.0):
+        self.refresh_interval = refresh_interval
+        self._models: Optional[List[dict]] = None
+        self._by_name: Dict[str, dict] = {}
+        self._refreshed_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._refreshed_at > self.refresh_interval
+
+    async def get_models(self) -> List[dict]:
+        """Return the current model list, refreshing only if nothing is cached yet.
+
+        Returns:
+            List[dict]: Models with id, name, is_avail and model_type
+        """
+        if self._models is None:
+            await self.refresh()
+        elif self.is_stale:
+            # Stale-while-revalidate: answer now, refresh in the background
+            self._start_refresh()
+        return self._models
+
+    async def resolve(self, name: str) -> Optional[dict]:
+        """Look up a model by name in the in-memory index.
+
+        Args:
+            name: The model name
+
+        Returns:
+            Optional[dict]: The model's id, name, is_avail and model_type, or None if unknown
+        """
+        if self._models is None:
+            await self.refresh()
+        return self._by_name.get(name)
+
+    def _set_models(self, models_list: List[dict]):
+        by_name = {}
+        for model in models_list:
+            # Keep the first (lowest id) entry if a name exists for several providers
+            by_name.setdefault(model["name"], model)
+        self._models = models_list
+        self._by_name = by_name
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.get_running_loop().create_task(self._refresh())
+        return self._inflight
+
+    async def refresh(self) -> List[dict]:
+        """Refresh the catalog, joining a refresh that is already running.
+
+        Returns:
+            List[dict]: The refreshed model list
+        """
+        await asyncio.shield(self._start_refresh())
+        return self._models
+
+    async def _refresh(self):
+        try:
+            ollama_names = await get_ollama_model_names()
+            groq_models = await asyncio.to_thread(get_groq_models)
+            self._set_models(await asyncio.to_thread(self._sync_database, ollama_names, set(groq_models)))
+        except Exception as e:
+            logger.error(f"Model catalog refresh failed: {str(e)}")
+            if self._models is None:
+                self._set_models(await asyncio.to_thread(self._load_fallback))
+        self._refreshed_at = time.monotonic()
+
+    def _sync_database(self, ollama_names: Set[str], groq_models: Set[str]) -> List[dict]:
+        db = database.SessionLocal()
+        try:
+            db_models = db.query(models.ModelList).order_by(models.ModelList.id).all()
+            db_model_names = {model.name for model in db_models}
+            changed = False
+
+            # Update existing models' availability
+            for model in db_models:
+                if model.model_type == "ollama":
+                    is_avail = model.name in ollama_names
+                elif model.model_type == "groq":
+                    is_avail = model.name in groq_models
+                else:
+                    continue
+                if model.is_avail != is_avail:
+                    model.is_avail = is_avail
+                    changed = True
+
+            # Add newly discovered models
+            for model_name in ollama_names - db_model_names:
+                db.add(models.ModelList(name=model_name, is_avail=True, model_type="ollama"))
+                changed = True
+            for model_name in groq_models - db_model_names:
+                db.add(models.ModelList(name=model_name, is_avail=True, model_type="groq"))
+                changed = True
+
+            if changed:
+                db.commit()
+                db_models = db.query(models.ModelList).order_by(models.ModelList.id).all()
+                logger.info("Model availability changed, catalog updated")
+            return [_serialize(model) for model in db_models]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _load_fallback(self) -> List[dict]:
+        # Providers are unreachable: report database models with conservative availability
+        db = database.SessionLocal()
+        try:
+            return [
+                {
+                    **_serialize(model),
+                    "is_avail": False if model.model_type == "ollama" else bool(GROQ_API_KEY)
+                } for model in db.query(models.ModelList).order_by(models.ModelList.id).all()
+            ]
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Model catalog refresh loop error: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        """Start the periodic background refresh."""
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic background refresh."""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            self._loop_task = None
+
+catalog = ModelCatalog(refresh_interval=MODEL_CATALOG_REFRESH_SECONDS)
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Union
+
+import llm_clients
+from metrics import metrics
+from scheduler import QueueFull, QueueTimeout, scheduler
+
+logger = logging.getLogger(__name__)
+
+# Ollama models loaded at startup, e.g. "llama3.2,phi4"
+OLLAMA_PRELOAD_MODELS = os.getenv("OLLAMA_PRELOAD_MODELS", "")
+# How long Ollama keeps a model loaded after its last request ("30m", "1h", seconds, or -1 for always)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Per-model keep-alive overrides, e.g. "llama3.2=-1,deepseek-r1=5m"
+OLLAMA_MODEL_KEEP_ALIVE = os.getenv("OLLAMA_MODEL_KEEP_ALIVE", "")
+# Memory (MB) loaded models may use together before the least recently used is unloaded; 0 disables the limit
+OLLAMA_RAM_BUDGET_MB = float(os.getenv("OLLAMA_RAM_BUDGET_MB", "0"))
+# How often (seconds) loaded models are read back from Ollama
+OLLAMA_RESIDENCY_POLL_SECONDS = float(os.getenv("OLLAMA_RESIDENCY_POLL_SECONDS", "30"))
+
+_UNITS = {"s": 1, "m": 60, "h": 3600}
+# Registry key of the client used for ps; Ollama clients are per host, not per model
+_PS_CLIENT = "residency"
+
+def _parse_overrides(value: str) -> Dict[str, str]:
+    overrides = {}
+    for item in value.split(","):
+        name, _, keep_alive = item.strip().rpartition("=")
+        if name and keep_alive:
+            overrides[name] = keep_alive
+    return overrides
+
+def keep_alive_seconds(keep_alive: Union[str, int]) -> Optional[float]:
+    """Convert an Ollama keep-alive value to seconds.
+
+    Args:
+        keep_alive: Duration such as '30m', '1h', '90s' or a number of seconds
+
+    Returns:
+        Optional[float]: Seconds, or None if the model is kept loaded
+        indefinitely (or the duration is not understood)
+    """
+    text = str(keep_alive).strip()
+    unit = _UNITS.get(text[-1:], None)
+    try:
+        seconds = float(text[:-1]) * unit if unit else float(text)
+    except ValueError:
+        return None
+    return None if seconds < 0 else seconds
+
+def _base_name(model: str) -> str:
+    return model.split(":")[0]
+
+class ModelResidency:
+    """Tracks which Ollama models are loaded and keeps the busy ones warm.
+
+    Configured models are loaded at startup so the first learner does not
+    pay the model load. Every generation passes the model's keep-alive to
+    Ollama and records its use; a request for a model that is not loaded
+    is counted as a cold start. The loaded set is read back from Ollama's
+    ``ps`` every ``OLLAMA_RESIDENCY_POLL_SECONDS`` and, when the models
+    together exceed ``OLLAMA_RAM_BUDGET_MB``, the least recently used idle
+    model is unloaded.
+    """
+
+    def __init__(self, preload: str, keep_alive: str, overrides: str, ram_budget: int, poll_interval: float):
+        self.preload_models = [name.strip() for name in preload.split(",") if name.strip()]
+        self.keep_alive = keep_alive
+        self.overrides = _parse_overrides(overrides)
+        self.ram_budget = ram_budget
+        self.poll_interval = poll_interval
+        self._resident: Dict[str, int] = {}
+        self._last_used: Dict[str, float] = {}
+        self._cold_starts: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def keep_alive_for(self, model_name: str) -> Union[str, int]:
+        """Get the keep-alive sent to Ollama with requests for a model."""
+        keep_alive = self.overrides.get(model_name, self.keep_alive)
+        return int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+
+    def is_resident(self, model_name: str) -> bool:
+        """Check whether a model is loaded, as of the last poll or request."""
+        if model_name not in self._resident:
+            return False
+        ttl = keep_alive_seconds(self.keep_alive_for(model_name))
+        # Ollama unloads the model once its keep-alive runs out
+        return ttl is None or time.monotonic() - self._last_used.get(model_name, 0.0) < ttl
+
+    def note_request(self, model_name: str):
+        """Record a generation request for a model.
+
+        Args:
+            model_name: The Ollama model about to be used
+        """
+        if not self.is_resident(model_name):
+            self._cold_starts[model_name] = self._cold_starts.get(model_name, 0) + 1
+            metrics.incr("residency.cold_starts")
+            # Size is unknown until the next poll
+            self._resident.setdefault(model_name, 0)
+        self._last_used[model_name] = time.monotonic()
+
+    async def preload(self, model_name: str) -> bool:
+        """Load a model into Ollama without generating anything.
+
+        Args:
+            model_name: The Ollama model
+
+        Returns:
+            bool: True if the model was loaded
+        """
+        start = time.perf_counter()
+        try:
+            # Loading counts against the model's concurrency limit like a generation
+            admission = await scheduler.acquire("ollama", model_name, "preload")
+        except (QueueFull, QueueTimeout):
+            logger.warning(f"Skipped preloading busy Ollama model {model_name}")
+            return False
+        try:
+            client = llm_clients.registry.get("ollama", model_name)
+            # An empty prompt only loads the model
+            await client.generate(model=model_name, prompt="", keep_alive=self.keep_alive_for(model_name))
+        except Exception as e:
+            logger.warning(f"Could not preload Ollama model {model_name}: {str(e)}")
+            return False
+        finally:
+            admission.release()
+        self._resident.setdefault(model_name, 0)
+        self._last_used[model_name] = time.monotonic()
+        metrics.observe("residency.preload", time.perf_counter() - start)
+        logger.info(f"Preloaded Ollama model {model_name} in {time.perf_counter() - start:.1f}s")
+        return True
+
+    async def unload(self, model_name: str):
+        """Ask Ollama to unload a model now."""
+        client = llm_clients.registry.get("ollama", model_name)
+        await client.generate(model=model_name, prompt="", keep_alive=0)
+        self._resident.pop(model_name, None)
+        metrics.incr("residency.evictions")
+        logger.info(f"Unloaded Ollama model {model_name} to stay within the memory budget")
+
+    async def refresh(self):
+        """Read the loaded models and their sizes back from Ollama."""
+        client = llm_clients.registry.get("ollama", _PS_CLIENT)
+        response = await client.ps()
+        self._resident = {_base_name(model.model): model.size for model in response["models"]}
+        now = time.monotonic()
+        for name in self._resident:
+            # Loaded outside this process; treat as just used
+            self._last_used.setdefault(name, now)
+
+    async def enforce_budget(self):
+        """Unload least recently used idle models while the budget is exceeded."""
+        if not self.ram_budget:
+            return
+        running = scheduler.snapshot()
+        candidates = sorted(
+            (name for name in self._resident if not running.get(f"ollama:{name}", {}).get("running")),
+            key=lambda name: self._last_used.get(name, 0.0)
+        )
+        for name in candidates:
+            if sum(self._resident.values()) <= self.ram_budget:
+                break
+            try:
+                await self.unload(name)
+            except Exception as e:
+                logger.error(f"Could not unload Ollama model {name}: {str(e)}")
+
+    def annotate(self, models_list: List[dict]) -> List[dict]:
+        """Add residency and cold-start counts to catalog entries.
+
+        Args:
+            models_list: Models from the catalog
+
+        Returns:
+            List[dict]: Copies of the entries with 'resident' and 'cold_starts'
+            (None and 0 for models not served by Ollama)
+        """
+        return [
+            {
+                **model,
+                "resident": self.is_resident(model["name"]) if model["model_type"] == "ollama" else None,
+                "cold_starts": self._cold_starts.get(model["name"], 0),
+            } for model in models_list
+        ]
+
+    async def _run(self):
+        for name in self.preload_models:
+            await self.preload(name)
+        while True:
+            try:
+                await self.refresh()
+                await self.enforce_budget()
+            except Exception as e:
+                logger.warning(f"Ollama residency poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        """Preload the configured models and start polling in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop polling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+residency = ModelResidency(
+    OLLAMA_PRELOAD_MODELS,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_MODEL_KEEP_ALIVE,
+    int(OLLAMA_RAM_BUDGET_MB * 1024 * 1024),
+    OLLAMA_RESIDENCY_POLL_SECONDS
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -81,8 +81,14 @@ class Conversation(Base):
         model (ModelList): Associated AI model.
         category (Category): Associated category.
         messages (List[Message]): Messages in this conversation.
+        summary (ConversationSummary): Rolling summary of older messages.
     """
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Serve the conversation listing, per user and for admins, ordered by (updated_at, id)
+        Index("ix_conversations_user_updated_id", "user_id", "updated_at", "id"),
+        Index("ix_conversations_updated_id", "updated_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
@@ -96,6 +102,8 @@ class Conversation(Base):
     model = relationship("ModelList", back_populates="conversations")
     category = relationship("Category", back_populates="conversations")
     messages = relationship("Message", back_populates="conversation")
+    summary = relationship("ConversationSummary", back_populates="conversation", uselist=False,
+                           cascade="all, delete-orphan", passive_deletes=True)
 
 class Message(Base):
     """
@@ -106,15 +114,50 @@ class Message(Base):
         conversation_id (int): Foreign key referencing the conversation.
         role (str): Role of the sender (e.g., user, assistant).
         content (str): Text content of the message.
+        status (str): 'complete', or 'in_progress' / 'interrupted' for a partial answer.
         created_at (datetime): Timestamp when the message was created.
         conversation (Conversation): Associated conversation.
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves per-conversation message pages ordered by (created_at, id)
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False)
     role = Column(String, nullable=False)
     content = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default="complete", server_default="complete")
     created_at = Column(DateTime, default=datetime.utcnow)
     
     conversation = relationship("Conversation", back_populates="messages")
+
+class ConversationSummary(Base):
+    """
+    Represents the rolling summary of the older part of a conversation.
+
+    Prompts use the summary plus the messages after ``last_message_id``
+    instead of the full transcript.
+
+    Attributes:
+        id (int): Primary key.
+        conversation_id (int): Foreign key referencing the conversation (unique).
+        content (str): Summary text.
+        last_message_id (int): ID of the newest message covered by the summary.
+        token_count (int): Token count of the summary text.
+        created_at (datetime): Creation timestamp.
+        updated_at (datetime): Last updated timestamp.
+        conversation (Conversation): Associated conversation.
+    """
+    __tablename__ = "conversation_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE", onupdate="CASCADE"), nullable=False, unique=True)
+    content = Column(Text, nullable=False)
+    last_message_id = Column(Integer, nullable=False)
+    token_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    conversation = relationship("Conversation", back_populates="summary")
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Reuse Ollama's returned KV context between turns of a conversation
+OLLAMA_CONTEXT_REUSE = os.getenv("OLLAMA_CONTEXT_REUSE", "false").lower() == "true"
+# Memory budget for stored contexts (token ids are kept as 32-bit ints)
+OLLAMA_CONTEXT_CACHE_MB = float(os.getenv("OLLAMA_CONTEXT_CACHE_MB", "64"))
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+class _ContextEntry:
+    """Ollama context of one conversation and what it was built from.
+
+    Attributes:
+        model_name: Model that produced the context.
+        prefix_digest: Digest of the system prompt (including any summary).
+        last_response_digest: Digest of the assistant answer that ended the context.
+        context: Token ids returned by Ollama.
+    """
+
+    def __init__(self, model_name: str, prefix_digest: str, last_response_digest: str, context: List[int]):
+        self.model_name = model_name
+        self.prefix_digest = prefix_digest
+        self.last_response_digest = last_response_digest
+        self.context = array("i", context)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.context) * self.context.itemsize
+
+class OllamaContextCache:
+    """Per-conversation store of Ollama generation contexts.
+
+    When the next turn of a conversation arrives with the same model, the
+    same system prompt and the previous answer as its last history entry,
+    only the new user turn is sent together with the stored context, so
+    Ollama does not re-evaluate the category prompt and transcript. Entries
+    are evicted least recently used first once ``max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, _ContextEntry]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, conversation_id: int, model_name: str, system_prompt: str, history: list) -> Optional[List[int]]:
+        """Get the stored context if it still matches the conversation.
+
+        Args:
+            conversation_id: The conversation ID
+            model_name: Model for the new turn
+            system_prompt: System prompt for the new turn
+            history: History turns for the new turn, in chronological order
+
+        Returns:
+            Optional[List[int]]: The context token ids, or None if missing or invalid
+        """
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+        last = history[-1] if history else None
+        if (
+            entry.model_name != model_name
+            or entry.prefix_digest != _digest(system_prompt)
+            or last is None
+            or last.role != "assistant"
+            or entry.last_response_digest != _digest(last.content)
+        ):
+            self.invalidate(conversation_id)
+            return None
+        self._entries.move_to_end(conversation_id)
+        return entry.context.tolist()
+
+    def put(self, conversation_id: int, model_name: str, system_prompt: str, response_text: str, context: List[int]):
+        """Store the context returned at the end of a turn.
+
+        Args:
+            conversation_id: The conversation ID
+            model_name: Model that produced the context
+            system_prompt: System prompt used for the turn
+            response_text: The complete assistant answer
+            context: Token ids returned by Ollama
+        """
+        self.invalidate(conversation_id)
+        entry = _ContextEntry(model_name, _digest(system_prompt), _digest(response_text), context)
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[conversation_id] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def invalidate(self, conversation_id: int):
+        """Drop the stored context of a conversation."""
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+context_cache = OllamaContextCache(int(OLLAMA_CONTEXT_CACHE_MB * 1024 * 1024))
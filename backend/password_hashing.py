@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from metrics import metrics, record_timing
+
+# Set passlib log level to ERROR to ignore warnings
+logging.getLogger("passlib").setLevel(logging.ERROR)
+
+# bcrypt cost factor for new hashes (existing hashes keep their own cost)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Worker processes dedicated to password hashing
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hashing jobs allowed to run or wait before new ones are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing queue is full and the job is rejected."""
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+def _mp_context():
+    # Forking a process that already runs threads (the server's thread pools)
+    # can deadlock the child on a lock held at fork time; forkserver and spawn
+    # start workers from a clean process instead
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Import passlib once in the fork server rather than in every worker
+        context.set_forkserver_preload(["password_hashing"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+def start():
+    """Create the worker pool; called from the server's startup hook."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=_mp_context())
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Scripts that never run the startup hook get the pool on first use
+    start()
+    return _executor
+
+async def _submit(name: str, fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        metrics.incr(f"password_hash.{name}.rejected")
+        raise PasswordHashingBusy()
+    _pending += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+        elapsed = time.perf_counter() - start
+        record_timing("password_hash", elapsed)
+        metrics.observe(f"password_hash.{name}", elapsed)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password in the dedicated hashing pool.
+
+    Args:
+        plain_password: The plaintext password provided by the user
+        hashed_password: The hashed password stored in the database
+
+    Returns:
+        bool: True if passwords match, False otherwise
+
+    Raises:
+        PasswordHashingBusy: If too many hashing jobs are already pending
+    """
+    return await _submit("verify", _verify, plain_password, hashed_password)
+
+async def hash_password(password: str) -> str:
+    """Hash a password in the dedicated hashing pool.
+
+    Args:
+        password: The plaintext password to hash
+
+    Returns:
+        str: The hashed password
+
+    Raises:
+        PasswordHashingBusy: If too many hashing jobs are already pending
+    """
+    return await _submit("hash", _hash, password)
+
+def shutdown():
+    """Stop the worker processes."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+from typing import Dict, NamedTuple, Optional
+
+import database
+import models
+from conversation_history import count_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = os.getenv("PROMPTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts"))
+# How often (seconds) the prompts directory is checked for changes
+PROMPT_RELOAD_SECONDS = float(os.getenv("PROMPT_RELOAD_SECONDS", "5"))
+DEFAULT_CATEGORY = "general"
+
+class CompiledPrompt(NamedTuple):
+    """A system prompt ready to be sent, with its token count.
+
+    Attributes:
+        text: The prompt text.
+        tokens: Token count of the text.
+    """
+    text: str
+    tokens: int
+
+def slugify(name: str) -> str:
+    """Convert a category name to its prompt file name (e.g. 'Goal Setting' -> 'goal-setting')."""
+    return name.lower().replace(" ", "-")
+
+class PromptCache:
+    """In-memory table from category ID to compiled system prompt.
+
+    Every ``*.txt`` file in the prompts directory is a category prompt named
+    after the category slug. The table is built at startup and rebuilt when a
+    file in the directory is added, removed or modified, so prompt edits take
+    effect without a restart and request handlers never touch the database
+    to pick a prompt.
+    """
+
+    def __init__(self, prompts_dir: str):
+        self.prompts_dir = prompts_dir
+        self._by_slug: Dict[str, CompiledPrompt] = {}
+        self._category_slugs: Dict[int, str] = {}
+        self._by_category_id: Dict[int, CompiledPrompt] = {}
+        self._mtimes: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _scan(self) -> Dict[str, float]:
+        try:
+            return {
+                entry.name: entry.stat().st_mtime
+                for entry in os.scandir(self.prompts_dir)
+                if entry.is_file() and entry.name.endswith(".txt")
+            }
+        except FileNotFoundError:
+            return {}
+
+    def load_prompts(self) -> bool:
+        """Reload the prompt files if the directory changed.
+
+        Returns:
+            bool: True if the prompts were reloaded
+        """
+        mtimes = self._scan()
+        if mtimes == self._mtimes:
+            return False
+        by_slug = {}
+        for file_name in mtimes:
+            with open(os.path.join(self.prompts_dir, file_name), "r", encoding="utf-8") as f:
+                text = f.read().strip()
+            by_slug[file_name[:-len(".txt")]] = CompiledPrompt(text, count_tokens(text))
+        self._by_slug = by_slug
+        self._mtimes = mtimes
+        self._compile()
+        logger.info(f"Loaded {len(by_slug)} category prompts from {self.prompts_dir}")
+        return True
+
+    def load_categories(self):
+        """Reload the category ID to slug mapping from the database."""
+        db = database.SessionLocal()
+        try:
+            self._category_slugs = {
+                category.id: slugify(category.name) for category in db.query(models.Category).all()
+            }
+        finally:
+            db.close()
+        self._compile()
+
+    def _compile(self):
+        default = self.default
+        self._by_category_id = {
+            category_id: self._by_slug.get(slug, default)
+            for category_id, slug in self._category_slugs.items()
+        }
+
+    @property
+    def default(self) -> CompiledPrompt:
+        return self._by_slug.get(DEFAULT_CATEGORY, CompiledPrompt("", 0))
+
+    def get(self, category_id: Optional[int]) -> CompiledPrompt:
+        """Get the system prompt for a category.
+
+        Args:
+            category_id: The category ID, or None
+
+        Returns:
+            CompiledPrompt: The category's prompt, or the general prompt if unknown
+        """
+        return self._by_category_id.get(category_id, self.default)
+
+    def slug(self, category_id: Optional[int]) -> str:
+        """Get the prompt slug of a category, or the general one if unknown."""
+        return self._category_slugs.get(category_id, DEFAULT_CATEGORY)
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(PROMPT_RELOAD_SECONDS)
+            try:
+                if self.load_prompts() or not self._category_slugs:
+                    # Pick up categories added alongside new prompt files
+                    await asyncio.to_thread(self.load_categories)
+            except Exception as e:
+                logger.error(f"Prompt reload failed: {str(e)}")
+
+    async def start(self):
+        """Build the category table and start watching the prompts directory."""
+        try:
+            await asyncio.to_thread(self.load_categories)
+        except Exception as e:
+            logger.error(f"Could not load categories, using the general prompt until the next reload: {str(e)}")
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self):
+        """Stop watching the prompts directory."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+prompt_cache = PromptCache(PROMPTS_DIR)
+prompt_cache.load_prompts()
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional, Set
+
+from sqlalchemy import update
+
+import database
+import message_writer
+import models
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Save the partial answer at least this often (seconds) while it is generated
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "2"))
+# ...or whenever this many new characters have been generated since the last save
+CHECKPOINT_MIN_CHARS = int(os.getenv("CHECKPOINT_MIN_CHARS", "2000"))
+
+IN_PROGRESS = "in_progress"
+COMPLETE = "complete"
+INTERRUPTED = "interrupted"
+
+# Keep references to detached saves so they are not garbage collected mid-write
+_tasks: Set[asyncio.Task] = set()
+
+class ResponseCheckpointer:
+    """Accumulates a streamed assistant answer and saves it as it grows.
+
+    Chunks are kept in a list, so memory stays linear in the answer length.
+    Once the answer is older than ``CHECKPOINT_INTERVAL_SECONDS`` or has grown
+    by ``CHECKPOINT_MIN_CHARS``, the partial text is saved as an
+    ``in_progress`` message in the background; later checkpoints update the
+    same row. Answers that finish before the first checkpoint are written
+    once at the end (through the write-behind queue when enabled), so short
+    answers cost no extra writes.
+    """
+
+    def __init__(self, conversation_id: int):
+        self.conversation_id = conversation_id
+        self.message_id: Optional[int] = None
+        self._chunks: List[str] = []
+        self._length = 0
+        self._saved_length = 0
+        self._saved_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def add(self, chunk: str):
+        """Append a chunk and start a checkpoint if one is due.
+
+        Args:
+            chunk: The next piece of the answer
+        """
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        if self._task is not None and not self._task.done():
+            # The previous checkpoint is still being written
+            return
+        if (
+            self._length - self._saved_length >= CHECKPOINT_MIN_CHARS
+            or time.monotonic() - self._saved_at >= CHECKPOINT_INTERVAL_SECONDS
+        ):
+            self._saved_length = self._length
+            self._saved_at = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._checkpoint(self.text))
+
+    async def _checkpoint(self, content: str):
+        start = time.perf_counter()
+        try:
+            await self._save(content, IN_PROGRESS)
+        except Exception as e:
+            logger.error(f"Checkpoint of conversation {self.conversation_id} failed: {str(e)}")
+            metrics.incr("checkpoint.errors")
+        else:
+            metrics.incr("checkpoint.writes")
+            metrics.observe("checkpoint.write", time.perf_counter() - start)
+
+    async def _save(self, content: str, status: str):
+        async with database.session_scope() as db:
+            if self.message_id is None:
+                # Keep the earlier user message ahead of this row
+                await message_writer.writer.flush_conversation(self.conversation_id)
+                message = models.Message(
+                    conversation_id=self.conversation_id,
+                    role="assistant",
+                    content=content,
+                    status=status
+                )
+                db.add(message)
+                await db.commit()
+                self.message_id = message.id
+            else:
+                await db.execute(
+                    update(models.Message).where(models.Message.id == self.message_id).values(
+                        content=content, status=status
+                    )
+                )
+                await db.commit()
+
+    async def finish(self, status: str = COMPLETE) -> str:
+        """Save the final answer once the stream has ended.
+
+        Args:
+            status: 'complete', or 'interrupted' if generation stopped early
+
+        Returns:
+            str: The full answer text
+        """
+        if self._task is not None:
+            await self._task
+        text = self.text
+        if self.message_id is None and status == COMPLETE and message_writer.MESSAGE_WRITE_BEHIND:
+            message_writer.writer.enqueue(self.conversation_id, "assistant", text)
+        elif self.message_id is not None or text:
+            await self._save(text, status)
+        return text
+
+    def finish_detached(self, status: str = INTERRUPTED):
+        """Save the answer from a task of its own.
+
+        Used when the stream itself is being cancelled, e.g. because the
+        client went away, and can no longer await the write.
+
+        Args:
+            status: Status to store with the answer
+        """
+        task = asyncio.get_running_loop().create_task(self._finish_logged(status))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+    async def _finish_logged(self, status: str):
+        try:
+            await self.finish(status)
+            metrics.incr(f"checkpoint.{status}")
+        except Exception as e:
+            logger.error(f"Saving the answer of conversation {self.conversation_id} failed: {str(e)}")
+
+async def drain_detached(timeout: float = 5.0):
+    """Wait for detached answer saves to finish, e.g. at shutdown.
+
+    Args:
+        timeout: Seconds to wait before giving up on the remaining saves
+    """
+    if _tasks:
+        await asyncio.wait(list(_tasks), timeout=timeout)
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Concurrent generations per local Ollama model
+OLLAMA_MAX_CONCURRENT_PER_MODEL = int(os.getenv("OLLAMA_MAX_CONCURRENT_PER_MODEL", "2"))
+# Concurrent generations per Groq model
+GROQ_MAX_CONCURRENT_PER_MODEL = int(os.getenv("GROQ_MAX_CONCURRENT_PER_MODEL", "16"))
+# Per-model overrides, e.g. "llama3.2=1,phi4=3"
+MODEL_CONCURRENCY = os.getenv("MODEL_CONCURRENCY", "")
+# Requests allowed to wait per model before new ones are rejected
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", "32"))
+# Longest time (seconds) a request waits for a slot
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "120"))
+
+def _parse_overrides(value: str) -> Dict[str, int]:
+    overrides = {}
+    for item in value.split(","):
+        name, _, limit = item.strip().rpartition("=")
+        if name and limit.isdigit():
+            overrides[name] = int(limit)
+    return overrides
+
+class QueueFull(Exception):
+    """Raised when a model's wait queue is full and the request is rejected."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Model is busy")
+        self.retry_after = retry_after
+
+class QueueTimeout(Exception):
+    """Raised when a request waited ``SCHEDULER_MAX_WAIT_SECONDS`` without getting a slot."""
+
+class Admission:
+    """A granted generation slot.
+
+    Attributes:
+        position: Position in the queue when the request arrived (0 if admitted at once).
+        wait_seconds: Time spent waiting for the slot.
+    """
+
+    def __init__(self, queue: "_ModelQueue", position: int, wait_seconds: float):
+        self._queue = queue
+        self.position = position
+        self.wait_seconds = wait_seconds
+        self._released = False
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-Queue-Position": str(self.position),
+            "X-Queue-Wait-Ms": str(int(self.wait_seconds * 1000)),
+        }
+
+    def release(self):
+        """Give the slot back; safe to call more than once."""
+        if not self._released:
+            self._released = True
+            self._queue.release()
+
+class _ModelQueue:
+    """Slots and waiting requests of one model, served round-robin across users."""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.running = 0
+        self.waiting = 0
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    def position_of(self, user_key: str) -> int:
+        """Estimate how many requests are served before a new one from ``user_key``."""
+        ahead = len(self._queues.get(user_key, ())) + 1
+        return sum(min(len(queue), ahead) for key, queue in self._queues.items() if key != user_key) + ahead
+
+    def enqueue(self, user_key: str) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user_key, deque()).append(waiter)
+        self.waiting += 1
+        return waiter
+
+    def remove(self, user_key: str, waiter: asyncio.Future):
+        queue = self._queues.get(user_key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[user_key]
+
+    def release(self):
+        self.running -= 1
+        self.dispatch()
+
+    def dispatch(self):
+        # Take the oldest request of the next user in turn, then move that user to the back
+        while self.running < self.limit and self._queues:
+            user_key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(user_key)
+            else:
+                del self._queues[user_key]
+            if waiter.done():
+                continue
+            self.running += 1
+            waiter.set_result(None)
+
+class Scheduler:
+    """Admission control in front of the model providers.
+
+    Each model has a concurrency limit; requests beyond it wait in a bounded
+    per-model queue. Waiting requests are served round-robin by user (guests
+    by client address), so one user submitting many questions cannot starve
+    the others. Requests arriving at a full queue are rejected at once.
+    """
+
+    def __init__(self, max_queue: int, max_wait: float):
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._overrides = _parse_overrides(MODEL_CONCURRENCY)
+        self._models: Dict[str, _ModelQueue] = {}
+
+    def limit_for(self, model_type: str, model_name: str) -> int:
+        if model_name in self._overrides:
+            return self._overrides[model_name]
+        return OLLAMA_MAX_CONCURRENT_PER_MODEL if model_type == "ollama" else GROQ_MAX_CONCURRENT_PER_MODEL
+
+    def _queue(self, model_type: str, model_name: str) -> _ModelQueue:
+        key = f"{model_type}:{model_name}"
+        queue = self._models.get(key)
+        if queue is None:
+            queue = self._models[key] = _ModelQueue(key, self.limit_for(model_type, model_name), self.max_queue)
+        return queue
+
+    async def acquire(self, model_type: str, model_name: str, user_key: str) -> Admission:
+        """Wait for a generation slot on a model.
+
+        Args:
+            model_type: Either 'ollama' or 'groq'
+            model_name: Name of the model
+            user_key: Identifies the requester for fair ordering, e.g. 'user:3' or 'guest:10.0.0.5'
+
+        Returns:
+            Admission: The granted slot; release it when the generation ends
+
+        Raises:
+            QueueFull: If the model's queue is full
+            QueueTimeout: If no slot was granted within ``max_wait`` seconds
+        """
+        queue = self._queue(model_type, model_name)
+        if queue.running < queue.limit and not queue.waiting:
+            queue.running += 1
+            metrics.incr("scheduler.admitted")
+            return Admission(queue, 0, 0.0)
+
+        if queue.waiting >= queue.max_queue:
+            metrics.incr("scheduler.rejected")
+            # Rough time until a slot frees, from the typical wait
+            raise QueueFull(retry_after=max(1, int(self.max_wait / 10)))
+
+        position = queue.position_of(user_key)
+        waiter = queue.enqueue(user_key)
+        metrics.gauge("scheduler.waiting", 1)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted as the wait was abandoned
+                queue.release()
+            else:
+                waiter.cancel()
+                queue.remove(user_key, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.incr("scheduler.timeouts")
+                raise QueueTimeout()
+            raise
+        finally:
+            metrics.gauge("scheduler.waiting", -1)
+
+        wait_seconds = time.perf_counter() - start
+        metrics.incr("scheduler.admitted")
+        metrics.observe("scheduler.wait", wait_seconds)
+        return Admission(queue, position, wait_seconds)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Get the limit, running and waiting counts of every model."""
+        return {
+            name: {"limit": queue.limit, "running": queue.running, "waiting": queue.waiting}
+            for name, queue in self._models.items()
+        }
+
+scheduler = Scheduler(SCHEDULER_MAX_QUEUE, SCHEDULER_MAX_WAIT_SECONDS)
@@ -0,0 +1,220 @@
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import llm_clients
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Categories (prompt slugs) whose first questions are matched by meaning; empty disables the cache
+SEMANTIC_CACHE_CATEGORIES = os.getenv("SEMANTIC_CACHE_CATEGORIES", "")
+# Local Ollama model used to embed questions
+SEMANTIC_CACHE_EMBED_MODEL = os.getenv("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text")
+# Cosine similarity a stored question needs to reach for its answer to be served
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# Questions kept in the index, least recently used evicted first
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+# File to memory-map the vectors to instead of keeping them on the heap; empty keeps them in memory
+SEMANTIC_CACHE_MEMMAP_PATH = os.getenv("SEMANTIC_CACHE_MEMMAP_PATH", "")
+
+class VectorIndex:
+    """Fixed-capacity index of unit vectors searched by cosine similarity.
+
+    Vectors are stored as float16 rows of one preallocated matrix (optionally
+    a ``numpy.memmap``), halving memory against float32 while keeping the
+    similarity error well below useful thresholds. Each row belongs to a
+    partition, and a search only considers rows of its partition. Once the
+    index is full, an insert replaces the least recently used row.
+
+    The matrix is allocated on the first insert, when the embedding size is
+    known.
+    """
+
+    def __init__(self, capacity: int, memmap_path: str = ""):
+        self.capacity = capacity
+        self.memmap_path = memmap_path
+        self.size = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._partitions = np.full(capacity, -1, dtype=np.int32)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._partition_ids: Dict[str, int] = {}
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self._vectors is None else self._vectors.shape[1]
+
+    def _allocate(self, dim: int):
+        shape = (self.capacity, dim)
+        if self.memmap_path:
+            self._vectors = np.memmap(self.memmap_path, dtype=np.float16, mode="w+", shape=shape)
+        else:
+            self._vectors = np.zeros(shape, dtype=np.float16)
+
+    def _partition_id(self, partition: str) -> int:
+        if partition not in self._partition_ids:
+            self._partition_ids[partition] = len(self._partition_ids)
+        return self._partition_ids[partition]
+
+    def search(self, partition: str, vector: np.ndarray) -> Tuple[int, float]:
+        """Find the most similar row of a partition.
+
+        Args:
+            partition: Partition to search
+            vector: Unit-length query vector
+
+        Returns:
+            Tuple[int, float]: Row and its cosine similarity, or (-1, -1.0) if the partition is empty
+        """
+        partition_id = self._partition_ids.get(partition)
+        if partition_id is None or self._vectors is None or vector.shape[0] != self.dim:
+            return -1, -1.0
+        rows = np.flatnonzero(self._partitions[:self.size] == partition_id)
+        if rows.size == 0:
+            return -1, -1.0
+        scores = self._vectors[rows].astype(np.float32) @ vector.astype(np.float32)
+        best = int(np.argmax(scores))
+        return int(rows[best]), float(scores[best])
+
+    def touch(self, row: int):
+        """Mark a row as recently used."""
+        self._last_used[row] = time.monotonic()
+
+    def insert(self, partition: str, vector: np.ndarray) -> Tuple[int, bool]:
+        """Add a unit-length vector, evicting the least recently used row when full.
+
+        Args:
+            partition: Partition of the vector
+            vector: Unit-length vector
+
+        Returns:
+            Tuple[int, bool]: Row written and whether it replaced an older entry
+        """
+        if self._vectors is None:
+            self._allocate(vector.shape[0])
+        if self.size < self.capacity:
+            row, evicted = self.size, False
+            self.size += 1
+        else:
+            row, evicted = int(np.argmin(self._last_used)), True
+        self._vectors[row] = vector
+        self._partitions[row] = self._partition_id(partition)
+        self.touch(row)
+        return row, evicted
+
+def normalize(vector) -> Optional[np.ndarray]:
+    """Scale an embedding to unit length, or None if it is empty or zero."""
+    array = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(array)) if array.size else 0.0
+    return array / norm if norm else None
+
+class SemanticCache:
+    """Answers of earlier questions, matched by meaning rather than wording.
+
+    Questions are embedded with a local Ollama embedding model and looked up
+    in a ``VectorIndex`` partitioned by category and model. When the closest
+    stored question reaches ``threshold`` its answer is served. Only opening
+    questions (no history) are cached, since a paraphrase asked mid-way
+    through a conversation usually needs a different answer.
+    """
+
+    def __init__(self, categories: str, embed_model: str, threshold: float, max_entries: int, memmap_path: str):
+        self.categories = {slug.strip() for slug in categories.split(",") if slug.strip()}
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.index = VectorIndex(max_entries, memmap_path)
+        self._answers: Dict[int, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def enabled_for(self, category_slug: str) -> bool:
+        """Check whether answers of a category are cached."""
+        return category_slug in self.categories
+
+    @staticmethod
+    def partition(category_slug: str, model_type: str, model_name: str) -> str:
+        return f"{category_slug}:{model_type}:{model_name}"
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """Embed a question with the local embedding model.
+
+        Args:
+            text: The question
+
+        Returns:
+            Optional[np.ndarray]: Unit-length embedding, or None if embedding failed
+        """
+        start = time.perf_counter()
+        try:
+            client = llm_clients.registry.get("ollama", self.embed_model)
+            response = await client.embed(model=self.embed_model, input=text)
+            vector = normalize(response["embeddings"][0])
+        except Exception as e:
+            logger.error(f"Embedding with {self.embed_model} failed: {str(e)}")
+            metrics.incr("semantic_cache.embed_errors")
+            return None
+        metrics.observe("semantic_cache.embed", time.perf_counter() - start)
+        return vector
+
+    def lookup(self, partition: str, vector: np.ndarray) -> Optional[str]:
+        """Get the answer of the most similar stored question.
+
+        Args:
+            partition: Partition from ``partition``
+            vector: Embedding of the new question
+
+        Returns:
+            Optional[str]: The answer, or None if no stored question is similar enough
+        """
+        start = time.perf_counter()
+        row, score = self.index.search(partition, vector)
+        metrics.observe("semantic_cache.search", time.perf_counter() - start)
+        if row >= 0 and score >= self.threshold:
+            self.index.touch(row)
+            self.hits += 1
+            metrics.incr("semantic_cache.hits")
+            return self._answers[row]
+        self.misses += 1
+        metrics.incr("semantic_cache.misses")
+        return None
+
+    def insert(self, partition: str, vector: np.ndarray, answer: str):
+        """Store the answer of a question.
+
+        Args:
+            partition: Partition from ``partition``
+            vector: Embedding of the question
+            answer: The complete answer
+        """
+        if not answer or (self.index.dim is not None and vector.shape[0] != self.index.dim):
+            return
+        row, evicted = self.index.insert(partition, vector)
+        self._answers[row] = answer
+        if evicted:
+            self.evictions += 1
+            metrics.incr("semantic_cache.evictions")
+
+    def stats(self) -> dict:
+        """Get entry counts, hits, misses and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "categories": sorted(self.categories),
+            "entries": self.index.size,
+            "capacity": self.index.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+semantic_cache = SemanticCache(
+    SEMANTIC_CACHE_CATEGORIES,
+    SEMANTIC_CACHE_EMBED_MODEL,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_MEMMAP_PATH
+)
@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useParams, useRouter } from "next/navigation";
 import useChat from "../../hooks/useChat";
 import ChatInput from "../../components/chat/ChatInput";
@@ -36,6 +36,8 @@ export default function ChatPage() {
     setResponse,
     isInitialized,
     getCurrentConversation,
+    loadMessages,
+    loadOlderMessages,
     handleChat,
     isThinking,
     availableModels,
@@ -43,7 +45,10 @@ export default function ChatPage() {
     selectedCategory,
     setSelectedCategory,
     categories,
-    isGuest
+    isGuest,
+    loadMoreConversations,
+    hasMoreConversations,
+    isLoadingConversations
   } = useChat();
 
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
@@ -51,6 +56,8 @@ export default function ChatPage() {
   const [editingTitle, setEditingTitle] = useState("");
   const [isModelSelectOpen, setIsModelSelectOpen] = useState(false);
   const [pendingNavigation, setPendingNavigation] = useState(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
+  const chatHistoryRef = useRef(null);
 
   /**
    * Handles saving an edited conversation title locally and to the backend (if not in guest mode).
@@ -149,6 +156,37 @@ export default function ChatPage() {
     }
   }, [chatId, conversations, setCurrentConversationId, isGuest, isInitialized, router]);
 
+  // Load the latest page of messages when a stored conversation is opened
+  useEffect(() => {
+    if (isGuest) return;
+    const conversation = conversations.find(conv => conv.id === currentConversationId);
+    if (conversation && conversation.messagesLoaded === false) {
+      loadMessages(conversation.id);
+    }
+  }, [currentConversationId, conversations, isGuest]);
+
+  /**
+   * Loads older messages when the chat history is scrolled to the top,
+   * keeping the visible messages in place.
+   */
+  const handleHistoryScroll = async () => {
+    const container = chatHistoryRef.current;
+    const conversation = getCurrentConversation();
+    if (!container || isGuest || isLoadingOlder || container.scrollTop > 50 || !conversation.olderCursor) return;
+
+    setIsLoadingOlder(true);
+    const previousHeight = container.scrollHeight;
+    try {
+      if (await loadOlderMessages(conversation.id)) {
+        requestAnimationFrame(() => {
+          container.scrollTop = container.scrollHeight - previousHeight;
+        });
+      }
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
   // Handle navigation
   useEffect(() => {
     if (pendingNavigation) {
@@ -318,6 +356,9 @@ export default function ChatPage() {
         <ConversationSidebar
           isOpen={isSidebarOpen}
           conversations={conversations}
+          onLoadMore={loadMoreConversations}
+          hasMore={hasMoreConversations}
+          isLoadingMore={isLoadingConversations}
           currentConversationId={currentConversationId}
           onConversationSelect={handleConversationSelect}
           onCreateNewChat={() => setIsModelSelectOpen(true)}
@@ -334,9 +375,10 @@ export default function ChatPage() {
       </ConversationManager>
       <div className="main-content">
         <h1 className="title">LearnSphere</h1>
-        <div className="chat-history">
+        <div className="chat-history" ref={chatHistoryRef} onScroll={handleHistoryScroll}>
           <ChatHistory
             messages={getCurrentConversation()?.messages || []}
+            isLoadingOlder={isLoadingOlder}
             isThinking={isThinking}
             response={response}
           />
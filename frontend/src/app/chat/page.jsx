@@ -32,7 +32,10 @@ export default function ChatListPage() {
     selectedCategory,
     setSelectedCategory,
     categories,
-    isGuest
+    isGuest,
+    loadMoreConversations,
+    hasMoreConversations,
+    isLoadingConversations
   } = useChat();
 
   const [isSidebarOpen, setIsSidebarOpen] = useState(true);
@@ -116,6 +119,9 @@ export default function ChatListPage() {
         <ConversationSidebar
           isOpen={isSidebarOpen}
           conversations={conversations}
+          onLoadMore={loadMoreConversations}
+          hasMore={hasMoreConversations}
+          isLoadingMore={isLoadingConversations}
           currentConversationId={currentConversationId}
           onConversationSelect={handleConversationSelect}
           onCreateNewChat={() => setIsModelSelectOpen(true)}
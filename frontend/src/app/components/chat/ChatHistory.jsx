@@ -8,17 +8,19 @@ import getGreeting from '../../utils/greeting';
  *
  * - Shows a greeting if there are no messages.
  * - Displays each message in order.
+ * - Shows a notice while older messages are being loaded.
  * - Optionally shows a thinking indicator if a response is pending.
  * - Displays a temporary streaming response if not yet part of the message list.
  *
  * @component
  * @param {Object} props
  * @param {Array<{ role: string, content: string }>} props.messages - Array of chat messages
+ * @param {boolean} props.isLoadingOlder - Whether older messages are being fetched
  * @param {boolean} props.isThinking - Whether the assistant is currently generating a response
  * @param {string} props.response - Current assistant response being streamed
  * @returns {JSX.Element}
  */
-const ChatHistory = ({ messages = [], isThinking, response }) => {
+const ChatHistory = ({ messages = [], isLoadingOlder = false, isThinking, response }) => {
   if (!messages.length) {
     return (
       <div className="empty-chat">
@@ -29,8 +31,9 @@ const ChatHistory = ({ messages = [], isThinking, response }) => {
 
   return (
     <>
+      {isLoadingOlder && <div className="loading-older">Loading earlier messages...</div>}
       {messages.map((msg, index) => (
-        <Message key={index} role={msg.role} content={msg.content} />
+        <Message key={msg.id != null ? `id-${msg.id}` : `idx-${index}`} role={msg.role} content={msg.content} />
       ))}
       {isThinking && <ThinkingIndicator />}
       {response && messages.every(msg => msg.content !== response) && (
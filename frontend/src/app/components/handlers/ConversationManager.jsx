@@ -109,18 +109,18 @@ const ConversationManager = ({
           return;
         }
 
-        // Delete each conversation
-        for (const conv of conversations) {
-          const response = await fetch(`http://localhost:8000/conversations/${conv.id}`, {
-            method: 'DELETE',
-            headers: {
-              'Authorization': `Bearer ${token}`
-            }
-          });
+        // Delete all of the user's conversations in one request
+        const response = await fetch('http://localhost:8000/conversations/bulk-delete', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Authorization': `Bearer ${token}`
+          },
+          body: JSON.stringify({ all: true })
+        });
 
-          if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-          }
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
         }
       } catch (error) {
         console.error('Error clearing conversations:', error);
@@ -30,6 +30,9 @@ const CATEGORY_ICONS = {
  * @param {(newTitle: string) => void} props.setEditingTitle - Setter for the title input value
  * @param {() => void} props.onSaveTitle - Handler to save the new title
  * @param {() => void} props.onCancelEdit - Handler to cancel the edit mode
+ * @param {() => void} [props.onLoadMore] - Handler to load the next page when scrolled to the bottom
+ * @param {boolean} [props.hasMore] - Whether older conversations remain to be loaded
+ * @param {boolean} [props.isLoadingMore] - Whether the next page is being fetched
  * @returns {JSX.Element}
  */
 const ConversationList = ({
@@ -42,7 +45,10 @@ const ConversationList = ({
   editingTitle,
   setEditingTitle,
   onSaveTitle,
-  onCancelEdit
+  onCancelEdit,
+  onLoadMore,
+  hasMore = false,
+  isLoadingMore = false
 }) => {
   const titleInputRef = useRef(null);
 
@@ -121,8 +127,21 @@ const ConversationList = ({
     }
   };
 
+  /**
+   * Loads the next page of conversations when the list is scrolled near its bottom.
+   *
+   * @param {React.UIEvent<HTMLDivElement>} e - The scroll event object
+   */
+  const handleScroll = (e) => {
+    const list = e.currentTarget;
+    if (onLoadMore && hasMore && !isLoadingMore &&
+        list.scrollHeight - list.scrollTop - list.clientHeight < 50) {
+      onLoadMore();
+    }
+  };
+
   return (
-    <div className="conversation-list">
+    <div className="conversation-list" onScroll={handleScroll}>
       {conversations.map(conv => (
         <div
           key={conv.id}
@@ -187,6 +206,7 @@ const ConversationList = ({
           )}
         </div>
       ))}
+      {isLoadingMore && <div className="loading-more">Loading more chats...</div>}
     </div>
   );
 };
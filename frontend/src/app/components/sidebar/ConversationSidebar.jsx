@@ -24,6 +24,9 @@ import '../../styles/sidebar.css';
  * @param {(title: string) => void} props.setEditingTitle - Setter function for the editing title state
  * @param {() => void} props.onSaveTitle - Callback to save the edited title
  * @param {() => void} props.onCancelEdit - Callback to cancel editing
+ * @param {() => void} [props.onLoadMore] - Callback to load the next page of conversations
+ * @param {boolean} [props.hasMore] - Whether older conversations remain to be loaded
+ * @param {boolean} [props.isLoadingMore] - Whether the next page is being fetched
  * @returns {JSX.Element}
  */
 const ConversationSidebar = ({
@@ -39,7 +42,10 @@ const ConversationSidebar = ({
   editingTitle,
   setEditingTitle,
   onSaveTitle,
-  onCancelEdit
+  onCancelEdit,
+  onLoadMore,
+  hasMore = false,
+  isLoadingMore = false
 }) => {
   /**
    * Wrapper to handle selecting a conversation from the list.
@@ -75,6 +81,9 @@ const ConversationSidebar = ({
         setEditingTitle={setEditingTitle}
         onSaveTitle={onSaveTitle}
         onCancelEdit={onCancelEdit}
+        onLoadMore={onLoadMore}
+        hasMore={hasMore}
+        isLoadingMore={isLoadingMore}
       />
       <button onClick={onClearAll} className="clear-all-button">
         Clear All Chats
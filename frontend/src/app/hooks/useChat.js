@@ -1,8 +1,17 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useRouter } from 'next/navigation';
 
 const DEFAULT_CONVERSATION = { id: 'default', title: 'New Chat', messages: [], model: 'llama3.2', category: 1 };
 
+// Number of conversations fetched per page of the sidebar listing
+const CONVERSATION_PAGE_SIZE = 50;
+
+// Number of messages fetched per page when opening a conversation or scrolling back
+const MESSAGE_PAGE_SIZE = 50;
+
+// Times an interrupted answer stream is resumed before giving up
+const MAX_STREAM_RESUME_ATTEMPTS = 3;
+
 const CATEGORIES = [
   { id: 1, name: 'General', icon: '💬' },
   { id: 2, name: 'Goal Setting', icon: '🎯' },
@@ -12,6 +21,33 @@ const CATEGORIES = [
   { id: 6, name: 'Social Learning', icon: '👥' }
 ];
 
+/**
+ * Merges a fetched page of stored messages with the messages already shown.
+ *
+ * Shown messages with an ID are kept unless the page contains them. Messages
+ * sent during the fetch have no ID yet; one is dropped when the page already
+ * holds its saved copy (same role and content), each saved message matching once.
+ *
+ * @function
+ * @param {Array<Object>} stored - Messages from the API, oldest first
+ * @param {Array<Object>} shown - Messages currently in the conversation
+ * @returns {Array<Object>} The stored messages followed by the shown messages not among them
+ */
+const mergeMessages = (stored, shown) => {
+  const ids = new Set(stored.map(msg => msg.id));
+  const unmatched = stored.slice();
+  return [
+    ...stored,
+    ...shown.filter(msg => {
+      if (msg.id !== undefined) return !ids.has(msg.id);
+      const index = unmatched.findIndex(saved => saved.role === msg.role && saved.content === msg.content);
+      if (index === -1) return true;
+      unmatched.splice(index, 1);
+      return false;
+    })
+  ];
+};
+
 /**
  * Custom hook for managing chat state and behavior in LearnSphere.
  */
@@ -29,6 +65,11 @@ const useChat = () => {
   const [isThinking, setIsThinking] = useState(false);
   const [isGuest, setIsGuest] = useState(false);
   const [error, setError] = useState('');
+  const [conversationsCursor, setConversationsCursor] = useState(null);
+  const [isLoadingConversations, setIsLoadingConversations] = useState(false);
+  const conversationsRequest = useRef(null);
+  // Conversations whose latest messages are being fetched
+  const messagesRequests = useRef(new Set());
 
   /**
    * Fetches available AI models from the backend and updates local state.
@@ -105,7 +146,7 @@ const useChat = () => {
    * Handles user input submission and sends it to the chat API (guest or authenticated).
    *
    * - Updates conversation state with the user message.
-   * - Sends a chat request to the backend with conversation history and metadata.
+   * - Sends a chat request to the backend (guest mode includes the local conversation history).
    * - Streams the AI response and appends it in real-time.
    * - Handles temporary ID replacement with server-assigned ID for logged-in users.
    * - Persists data in localStorage for guest mode.
@@ -163,11 +204,8 @@ const useChat = () => {
           } 
         : {
             user_input: userInput,
+            // History is loaded server-side from the stored conversation
             remember_history: true,
-            history: updatedConversation.messages.map(msg => ({
-              role: msg.role,
-              content: msg.content
-            })),
             model_id: modelIdMap[currentModel] || 1,
             // If it is a temporary ID or default, send null to let the backend create a new conversation
             conversation_id: currentConversationId !== 'default' && 
@@ -235,15 +273,48 @@ const useChat = () => {
         }
       }
 
-      const reader = response.body.getReader();
+      // Generation continues server-side if the connection drops; resume from the bytes received so far
+      const streamId = response.headers.get('X-Stream-ID');
+      let reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let receivedBytes = 0;
+      let resumeAttempts = 0;
       let aiResponse = "";
       let messageAdded = false;
 
       while (true) {
-        const { done, value } = await reader.read();
+        let result;
+        try {
+          result = await reader.read();
+        } catch (readError) {
+          if (!streamId || resumeAttempts >= MAX_STREAM_RESUME_ATTEMPTS) throw readError;
+          resumeAttempts += 1;
+          console.log(`Stream interrupted, resuming from byte ${receivedBytes} (attempt ${resumeAttempts})`);
+          await new Promise(resolve => setTimeout(resolve, 1000 * resumeAttempts));
+          try {
+            const resumed = await fetch(`http://localhost:8000/chat/stream/${streamId}?offset=${receivedBytes}`, {
+              headers: isGuest ? {} : { Authorization: `Bearer ${localStorage.getItem('token')}` },
+            });
+            if (resumed.ok) {
+              reader = resumed.body.getReader();
+            } else if (resumed.status === 404 || resumed.status === 410) {
+              // The stream is gone; keep what was received
+              throw readError;
+            }
+          } catch (resumeError) {
+            if (resumeError === readError) throw readError;
+            console.error('Error resuming stream:', resumeError);
+          }
+          continue;
+        }
+
+        const { done, value } = result;
         if (done) break;
+        receivedBytes += value.length;
+        resumeAttempts = 0;
 
-        const chunk = new TextDecoder().decode(value);
+        // Characters may be split across reads (and resumes), so decode as one stream
+        const chunk = decoder.decode(value, { stream: true });
         aiResponse += chunk;
         
         setConversations(prevConversations => 
@@ -388,11 +459,86 @@ const useChat = () => {
   }, [conversations, currentConversationId, isInitialized, isGuest]);
 
   /**
-   * Fetches the list of conversations for a logged-in user and sets the state accordingly.
+   * Converts a conversation from the API into the shape used by the sidebar.
+   *
+   * Category names (numeric or string) are normalized into kebab-case strings.
+   * Messages are loaded separately when the conversation is opened (see loadMessages).
+   *
+   * @function
+   * @param {Object} conv - Conversation from the API
+   * @returns {Object} The conversation with a numeric ID, normalized category and no messages loaded
+   */
+  const normalizeConversation = (conv) => {
+    let categoryValue = 'general';
+
+    if (typeof conv.category === 'number') {
+      const categoryMap = {
+        1: 'general',
+        2: 'goal-setting',
+        3: 'problem-solving',
+        4: 'text-summarization',
+        5: 'emotional-support',
+        6: 'social-learning'
+      };
+      categoryValue = categoryMap[conv.category] || 'general';
+    } else if (typeof conv.category === 'string') {
+      const normalizedCategory = conv.category.toLowerCase().replace(/\s+/g, '-');
+      const validCategories = [
+        'general', 'goal-setting', 'problem-solving',
+        'text-summarization', 'emotional-support', 'social-learning'
+      ];
+      categoryValue = validCategories.includes(normalizedCategory) ?
+                      normalizedCategory : 'general';
+    }
+
+    return {
+      ...conv,
+      id: Number(conv.id),
+      category: categoryValue,
+      messages: [],
+      messagesLoaded: false,
+      olderCursor: null
+    };
+  };
+
+  /**
+   * Fetches one page of the conversation listing, most recently updated first.
+   *
+   * @async
+   * @function
+   * @param {string} token - JWT token used for authenticated API requests
+   * @param {string|null} cursor - `next_cursor` of the previous page, or null for the first page
+   * @returns {Promise<Object|null>} The page (`conversations`, `next_cursor`), or null if unauthorized
+   */
+  const fetchConversationPage = async (token, cursor) => {
+    const params = new URLSearchParams({ limit: String(CONVERSATION_PAGE_SIZE) });
+    if (cursor) params.set('cursor', cursor);
+
+    const response = await fetch(`http://localhost:8000/conversations?${params}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+
+    if (!response.ok) {
+      if (response.status === 401) {
+        localStorage.removeItem('token');
+        router.push('/auth/login');
+        return null;
+      }
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  };
+
+  /**
+   * Fetches the first page of conversations for a logged-in user and sets the state accordingly.
    *
-   * - Makes an authenticated request to the backend to retrieve conversation history.
-   * - Normalizes category names (from numeric or string) into kebab-case strings.
-   * - Automatically detects if the user is on a specific chat page and sets the corresponding conversation.
+   * - Only the most recent page is loaded; later pages are loaded as the sidebar
+   *   is scrolled (see loadMoreConversations).
+   * - Automatically detects if the user is on a specific chat page and sets the corresponding
+   *   conversation, loading it directly when it is not on the first page.
    * - If unauthorized (401), clears the token and redirects to the login page.
    * - Falls back to the default conversation in case of errors.
    *
@@ -404,58 +550,16 @@ const useChat = () => {
   const fetchConversations = async (token) => {
     try {
       console.log('Fetching conversations with token:', token ? 'Token exists' : 'No token');
-      
-      const response = await fetch('http://localhost:8000/conversations', {
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
 
-      if (!response.ok) {
-        if (response.status === 401) {
-          localStorage.removeItem('token');
-          router.push('/auth/login');
-          return;
-        }
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
-
-      const data = await response.json();
+      const data = await fetchConversationPage(token, null);
+      if (!data) return;
       console.log('Received conversations data:', data);
       
       if (data.conversations && Array.isArray(data.conversations)) {
-        // Ensure ID is numeric and category is integer
-        const processedConversations = data.conversations.map(conv => {
-          let categoryValue = 'general';
-          
-          if (typeof conv.category === 'number') {
-            const categoryMap = {
-              1: 'general',
-              2: 'goal-setting',
-              3: 'problem-solving',
-              4: 'text-summarization',
-              5: 'emotional-support',
-              6: 'social-learning'
-            };
-            categoryValue = categoryMap[conv.category] || 'general';
-          } else if (typeof conv.category === 'string') {
-            const normalizedCategory = conv.category.toLowerCase().replace(/\s+/g, '-');
-            const validCategories = [
-              'general', 'goal-setting', 'problem-solving', 
-              'text-summarization', 'emotional-support', 'social-learning'
-            ];
-            categoryValue = validCategories.includes(normalizedCategory) ? 
-                            normalizedCategory : 'general';
-          }
-          
-          return {
-            ...conv,
-            id: Number(conv.id),
-            category: categoryValue
-          };
-        });
+        const processedConversations = data.conversations.map(normalizeConversation);
         
         setConversations(processedConversations);
+        setConversationsCursor(data.next_cursor);
         
         // Check the current path, only set the current conversation ID when visiting a specific conversation page
         if (typeof window !== 'undefined') {
@@ -482,6 +586,10 @@ const useChat = () => {
               if (matchingConversation) {
                 console.log('Found matching conversation:', matchingConversation.id);
                 setCurrentConversationId(matchingConversation.id);
+              } else if (await loadConversation(Number(chatIdFromUrl))) {
+                // An older conversation that is not on the first page
+                console.log('Loaded conversation from URL:', chatIdFromUrl);
+                setCurrentConversationId(Number(chatIdFromUrl));
               } else {
                 console.log('No matching conversation found, setting currentConversationId to null');
                 setCurrentConversationId(null);
@@ -497,6 +605,170 @@ const useChat = () => {
     }
   };
 
+  /**
+   * Loads the next page of conversations when the sidebar is scrolled to the bottom.
+   *
+   * Conversations already in the list (e.g. opened from a link) are not added twice.
+   *
+   * @async
+   * @function
+   * @returns {Promise<void>}
+   */
+  const loadMoreConversations = async () => {
+    const token = localStorage.getItem('token');
+    if (isGuest || !token || !conversationsCursor || conversationsRequest.current) return;
+
+    setIsLoadingConversations(true);
+    conversationsRequest.current = conversationsCursor;
+    try {
+      const page = await fetchConversationPage(token, conversationsCursor);
+      if (!page) return;
+
+      setConversations(prev => {
+        const loadedIds = new Set(prev.map(conv => conv.id));
+        const added = page.conversations
+          .map(normalizeConversation)
+          .filter(conv => !loadedIds.has(conv.id));
+        return [...prev, ...added];
+      });
+      setConversationsCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Error loading more conversations:', error);
+    } finally {
+      conversationsRequest.current = null;
+      setIsLoadingConversations(false);
+    }
+  };
+
+  /**
+   * Loads a single conversation that is not in the loaded listing, together with its latest messages.
+   *
+   * @async
+   * @function
+   * @param {number} conversationId - The ID of the conversation
+   * @returns {Promise<boolean>} True if the conversation was found and added
+   */
+  const loadConversation = async (conversationId) => {
+    try {
+      const page = await fetchMessagePage(conversationId, null);
+      if (!page) return false;
+
+      setConversations(prev => [
+        {
+          ...normalizeConversation(page.conversation),
+          messages: page.messages,
+          messagesLoaded: true,
+          olderCursor: page.before_cursor
+        },
+        ...prev.filter(conv => conv.id !== conversationId)
+      ]);
+      return true;
+    } catch (error) {
+      console.error('Error loading conversation:', error);
+      return false;
+    }
+  };
+
+  /**
+   * Fetches one page of a conversation's messages from the backend.
+   *
+   * @async
+   * @function
+   * @param {number} conversationId - The ID of the conversation
+   * @param {string|null} before - Cursor of the oldest loaded message, or null for the latest page
+   * @returns {Promise<Object|null>} The page (`messages`, `before_cursor`), or null on failure
+   */
+  const fetchMessagePage = async (conversationId, before) => {
+    const token = localStorage.getItem('token');
+    if (!token) return null;
+
+    const params = new URLSearchParams({ limit: String(MESSAGE_PAGE_SIZE) });
+    if (before) params.set('before', before);
+
+    const response = await fetch(`http://localhost:8000/conversations/${conversationId}/messages?${params}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+
+    if (!response.ok) {
+      if (response.status === 401) {
+        localStorage.removeItem('token');
+        router.push('/auth/login');
+        return null;
+      }
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return response.json();
+  };
+
+  /**
+   * Loads the latest messages of a conversation the first time it is opened.
+   *
+   * @async
+   * @function
+   * @param {number} conversationId - The ID of the conversation
+   * @returns {Promise<void>}
+   */
+  const loadMessages = async (conversationId) => {
+    // Conversation updates during the fetch re-run the caller's effect
+    if (messagesRequests.current.has(conversationId)) return;
+    messagesRequests.current.add(conversationId);
+    try {
+      const page = await fetchMessagePage(conversationId, null);
+      if (!page) return;
+
+      setConversations(prev => prev.map(conv =>
+        conv.id === conversationId
+          ? {
+              ...conv,
+              // Keep anything sent while the page was loading
+              messages: mergeMessages(page.messages, conv.messages),
+              messagesLoaded: true,
+              olderCursor: page.before_cursor
+            }
+          : conv
+      ));
+    } catch (error) {
+      console.error('Error loading messages:', error);
+    } finally {
+      messagesRequests.current.delete(conversationId);
+    }
+  };
+
+  /**
+   * Loads the page of messages preceding the oldest loaded message.
+   *
+   * @async
+   * @function
+   * @param {number} conversationId - The ID of the conversation
+   * @returns {Promise<boolean>} True if older messages were added
+   */
+  const loadOlderMessages = async (conversationId) => {
+    const conversation = conversations.find(conv => conv.id === conversationId);
+    if (!conversation || !conversation.olderCursor) return false;
+
+    try {
+      const page = await fetchMessagePage(conversationId, conversation.olderCursor);
+      if (!page) return false;
+
+      setConversations(prev => prev.map(conv =>
+        conv.id === conversationId
+          ? {
+              ...conv,
+              messages: [...page.messages, ...conv.messages],
+              olderCursor: page.before_cursor
+            }
+          : conv
+      ));
+      return page.messages.length > 0;
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+      return false;
+    }
+  };
+
   /**
    * Retrieves the currently active conversation by matching its ID.
    *
@@ -550,6 +822,11 @@ const useChat = () => {
     setSelectedCategory,
     categories: CATEGORIES,
     getCurrentConversation,
+    loadMessages,
+    loadOlderMessages,
+    loadMoreConversations,
+    hasMoreConversations: Boolean(conversationsCursor),
+    isLoadingConversations,
     handleChat,
     isThinking,
     isGuest,
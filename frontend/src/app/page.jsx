@@ -30,7 +30,10 @@ export default function ChatApp() {
     categories,
     handleChat,
     isThinking,
-    isGuest
+    isGuest,
+    loadMoreConversations,
+    hasMoreConversations,
+    isLoadingConversations
   } = useChat();
 
   const [editingTitleId, setEditingTitleId] = useState(null);
@@ -141,7 +144,6 @@ export default function ChatApp() {
           body: JSON.stringify({
             user_input: "New conversation",
             remember_history: false,
-            history: [],
             model_id: selectedModel.id,
             category_id: parseInt(category)
           }),
@@ -282,6 +284,9 @@ export default function ChatApp() {
           onSaveTitle={handleSaveTitle}
           onCancelEdit={handleCancelEdit}
           onEditTitle={handleEditTitle}
+          onLoadMore={loadMoreConversations}
+          hasMore={hasMoreConversations}
+          isLoadingMore={isLoadingConversations}
         />
       </ConversationManager>
       <div className="main-content">